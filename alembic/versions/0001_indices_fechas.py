@@ -0,0 +1,22 @@
+"""Indices on order and payment dates for range statistics
+
+Revision ID: 0001_indices_fechas
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0001_indices_fechas"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS ix_pedidos_fecha_pedido ON pedidos (fecha_pedido)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_pagos_fecha_pago ON pagos (fecha_pago)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_pagos_fecha_pago")
+    op.execute("DROP INDEX IF EXISTS ix_pedidos_fecha_pedido")
@@ -0,0 +1,75 @@
+"""Daily sales rollup table
+
+Revision ID: 0002_ventas_diarias
+Revises: 0001_indices_fechas
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_ventas_diarias"
+down_revision = "0001_indices_fechas"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ventas_diarias",
+        sa.Column("fecha", sa.Date(), primary_key=True),
+        sa.Column("total_pedidos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_ventas", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("total_cobrado", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("cantidad_pagos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("pedidos_pagados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("pedidos_pendientes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("monto_pendiente", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("devoluciones", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("monto_devuelto", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    
+    # Backfill from the existing history, with the same aggregates as RollupService.rebuild
+    op.execute("""
+        INSERT INTO ventas_diarias (
+            fecha, total_pedidos, total_ventas, pedidos_pagados, pedidos_pendientes, monto_pendiente,
+            devoluciones, monto_devuelto, total_cobrado, cantidad_pagos, updated_at
+        )
+        SELECT
+            COALESCE(p.fecha, g.fecha),
+            COALESCE(p.total_pedidos, 0),
+            COALESCE(p.total_ventas, 0),
+            COALESCE(p.pedidos_pagados, 0),
+            COALESCE(p.pedidos_pendientes, 0),
+            COALESCE(p.monto_pendiente, 0),
+            COALESCE(p.devoluciones, 0),
+            COALESCE(p.monto_devuelto, 0),
+            COALESCE(g.total_cobrado, 0),
+            COALESCE(g.cantidad_pagos, 0),
+            now()
+        FROM (
+            SELECT
+                CAST(fecha_pedido AS DATE) AS fecha,
+                count(id) AS total_pedidos,
+                COALESCE(sum(total), 0) AS total_ventas,
+                count(id) FILTER (WHERE estado = 'pagado') AS pedidos_pagados,
+                count(id) FILTER (WHERE estado = 'pendiente') AS pedidos_pendientes,
+                COALESCE(sum(total) FILTER (WHERE estado = 'pendiente'), 0) AS monto_pendiente,
+                count(id) FILTER (WHERE estado = 'devuelto') AS devoluciones,
+                COALESCE(sum(total) FILTER (WHERE estado = 'devuelto'), 0) AS monto_devuelto
+            FROM pedidos
+            GROUP BY 1
+        ) p
+        FULL OUTER JOIN (
+            SELECT
+                CAST(fecha_pago AS DATE) AS fecha,
+                count(id) AS cantidad_pagos,
+                COALESCE(sum(monto), 0) AS total_cobrado
+            FROM pagos
+            GROUP BY 1
+        ) g ON g.fecha = p.fecha
+    """)
+
+
+def downgrade():
+    op.drop_table("ventas_diarias")
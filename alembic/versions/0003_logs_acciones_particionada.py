@@ -0,0 +1,118 @@
+"""Range-partition logs_acciones by month on created_at
+
+Revision ID: 0003_logs_acciones_particionada
+Revises: 0002_ventas_diarias
+Create Date: 2026-10-18
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_logs_acciones_particionada"
+down_revision = "0002_ventas_diarias"
+branch_labels = None
+depends_on = None
+
+# Months created ahead of the current one; archive_logs_acciones.py keeps extending them
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, usuario_id, endpoint, metodo_http, payload, ip_address, user_agent, status_code, response_time_ms, created_at"
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+
+
+def _create_indexes():
+    op.execute("CREATE INDEX ix_logs_acciones_id ON logs_acciones (id)")
+    op.execute("CREATE INDEX ix_logs_acciones_usuario_id ON logs_acciones (usuario_id)")
+    op.execute("CREATE INDEX ix_logs_acciones_created_at ON logs_acciones (created_at)")
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    op.execute("ALTER TABLE logs_acciones RENAME TO logs_acciones_old")
+    op.execute("ALTER TABLE logs_acciones_old RENAME CONSTRAINT logs_acciones_pkey TO logs_acciones_old_pkey")
+    for index in ("ix_logs_acciones_id", "ix_logs_acciones_usuario_id", "ix_logs_acciones_created_at"):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    # Keep the id sequence so ids continue where they were
+    seq = conn.execute(sa.text("SELECT pg_get_serial_sequence('logs_acciones_old', 'id')")).scalar()
+    if seq:
+        op.execute(f"ALTER SEQUENCE {seq} OWNED BY NONE")
+    else:
+        seq = "logs_acciones_id_seq"
+        op.execute(f"CREATE SEQUENCE {seq}")
+
+    # The partition key must be part of the primary key
+    op.execute(f"""
+        CREATE TABLE logs_acciones (
+            id INTEGER NOT NULL DEFAULT nextval('{seq}'),
+            usuario_id INTEGER REFERENCES usuarios (id),
+            endpoint VARCHAR(200) NOT NULL,
+            metodo_http VARCHAR(10) NOT NULL,
+            payload JSON,
+            ip_address VARCHAR(50),
+            user_agent TEXT,
+            status_code INTEGER,
+            response_time_ms INTEGER,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT logs_acciones_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # One partition per month from the oldest log up to MONTHS_AHEAD months from now
+    oldest = conn.execute(sa.text("SELECT min(created_at) FROM logs_acciones_old")).scalar()
+    today = date.today()
+    month = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE logs_acciones_{month:%Y_%m} PARTITION OF logs_acciones "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+    # Safety net for rows outside every monthly partition
+    op.execute("CREATE TABLE logs_acciones_default PARTITION OF logs_acciones DEFAULT")
+
+    op.execute(f"INSERT INTO logs_acciones ({COLUMNS}) SELECT {COLUMNS} FROM logs_acciones_old")
+    op.execute("DROP TABLE logs_acciones_old")
+    op.execute(f"ALTER SEQUENCE {seq} OWNED BY logs_acciones.id")
+
+    # Indexes on the parent are created on every partition
+    _create_indexes()
+
+
+def downgrade():
+    conn = op.get_bind()
+    seq = conn.execute(sa.text("SELECT pg_get_serial_sequence('logs_acciones', 'id')")).scalar()
+    op.execute(f"ALTER SEQUENCE {seq} OWNED BY NONE")
+
+    op.execute("ALTER TABLE logs_acciones RENAME TO logs_acciones_part")
+    op.execute("ALTER TABLE logs_acciones_part RENAME CONSTRAINT logs_acciones_pkey TO logs_acciones_part_pkey")
+    for index in ("ix_logs_acciones_id", "ix_logs_acciones_usuario_id", "ix_logs_acciones_created_at"):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute(f"""
+        CREATE TABLE logs_acciones (
+            id INTEGER NOT NULL DEFAULT nextval('{seq}'),
+            usuario_id INTEGER REFERENCES usuarios (id),
+            endpoint VARCHAR(200) NOT NULL,
+            metodo_http VARCHAR(10) NOT NULL,
+            payload JSON,
+            ip_address VARCHAR(50),
+            user_agent TEXT,
+            status_code INTEGER,
+            response_time_ms INTEGER,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT logs_acciones_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"INSERT INTO logs_acciones ({COLUMNS}) SELECT {COLUMNS} FROM logs_acciones_part")
+    op.execute("DROP TABLE logs_acciones_part")
+    op.execute(f"ALTER SEQUENCE {seq} OWNED BY logs_acciones.id")
+    _create_indexes()
@@ -0,0 +1,32 @@
+"""Composite indexes for audit log filters ordered by created_at
+
+Revision ID: 0004_indices_logs_acciones
+Revises: 0003_logs_acciones_particionada
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004_indices_logs_acciones"
+down_revision = "0003_logs_acciones_particionada"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Created on the partitioned parent, so every monthly partition gets them
+    op.execute("CREATE INDEX IF NOT EXISTS ix_logs_acciones_usuario_created ON logs_acciones (usuario_id, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_logs_acciones_metodo_created ON logs_acciones (metodo_http, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_logs_acciones_status_created ON logs_acciones (status_code, created_at)")
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_logs_acciones_endpoint_created ON logs_acciones (endpoint COLLATE "C", created_at)'
+    )
+    # Covered by the (usuario_id, created_at) index
+    op.execute("DROP INDEX IF EXISTS ix_logs_acciones_usuario_id")
+
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS ix_logs_acciones_usuario_id ON logs_acciones (usuario_id)")
+    op.execute("DROP INDEX IF EXISTS ix_logs_acciones_endpoint_created")
+    op.execute("DROP INDEX IF EXISTS ix_logs_acciones_status_created")
+    op.execute("DROP INDEX IF EXISTS ix_logs_acciones_metodo_created")
+    op.execute("DROP INDEX IF EXISTS ix_logs_acciones_usuario_created")
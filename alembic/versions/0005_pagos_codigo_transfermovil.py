@@ -0,0 +1,24 @@
+"""Unique index on pagos.codigo_transfermovil: a Transfermóvil code is registered once
+
+Revision ID: 0005_pagos_codigo_transfermovil
+Revises: 0004_indices_logs_acciones
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0005_pagos_codigo_transfermovil"
+down_revision = "0004_indices_logs_acciones"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Payments without a code are not constrained. Fails if duplicate codes were already registered
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_pagos_codigo_transfermovil ON pagos (codigo_transfermovil) "
+        "WHERE codigo_transfermovil IS NOT NULL"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_pagos_codigo_transfermovil")
@@ -0,0 +1,28 @@
+"""(created_at DESC, id DESC) indexes for keyset pagination of the list endpoints
+
+Revision ID: 0006_indices_keyset
+Revises: 0005_pagos_codigo_transfermovil
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0006_indices_keyset"
+down_revision = "0005_pagos_codigo_transfermovil"
+branch_labels = None
+depends_on = None
+
+# Tables listed newest first with BaseService.keyset
+TABLES = ("pedidos", "clientes", "usuarios", "productos", "devoluciones", "logs_acciones")
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_created_id ON {table} (created_at DESC, id DESC)")
+    # Covered by the (created_at, id) index
+    op.execute("DROP INDEX IF EXISTS ix_logs_acciones_created_at")
+
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS ix_logs_acciones_created_at ON logs_acciones (created_at)")
+    for table in reversed(TABLES):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_created_id")
@@ -0,0 +1,53 @@
+"""
+Mantenimiento de las particiones mensuales de logs_acciones.
+
+- Crea las particiones del mes actual y de los próximos meses.
+- Mueve a su partición los registros que cayeron en logs_acciones_default
+  (por ejemplo si no se ejecutó algún mes).
+- Archiva en archivos .csv.gz las particiones más antiguas que la retención
+  configurada, y los registros igual de antiguos de la partición DEFAULT, y
+  los elimina de la base de datos.
+
+Uso (por ejemplo una vez al mes desde cron):
+    python archive_logs_acciones.py
+    python archive_logs_acciones.py --meses 6 --dir /var/backups/logs_acciones
+"""
+import argparse
+from src.config.settings import get_settings
+from src.core.database import SessionLocal
+from src.modules.audit.partition_service import AuditPartitionService
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Particiones y archivo de logs_acciones")
+    parser.add_argument("--meses", type=int, default=settings.AUDIT_RETENTION_MONTHS,
+                        help="Meses de logs que se conservan en la base de datos")
+    parser.add_argument("--dir", default=settings.AUDIT_ARCHIVE_DIR, help="Directorio de los archivos .csv.gz")
+    parser.add_argument("--adelante", type=int, default=settings.AUDIT_PARTITIONS_AHEAD,
+                        help="Meses futuros con partición ya creada")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        creadas = AuditPartitionService.ensure_partitions(db, args.adelante)
+        print(f"✅ Particiones nuevas: {', '.join(creadas) if creadas else 'ninguna'}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error creando particiones de logs_acciones: {e}")
+    
+    # La retención se aplica aunque falle la creación de particiones
+    try:
+        archivos = AuditPartitionService.apply_retention(db, args.meses, args.dir)
+        for archivo in archivos:
+            print(f"📦 Archivada: {archivo}")
+        print(f"✅ {len(archivos)} particiones archivadas (retención: {args.meses} meses)")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error en el mantenimiento de logs_acciones: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
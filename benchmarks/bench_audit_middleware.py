@@ -0,0 +1,129 @@
+"""
+Rendimiento del middleware de auditoría: versión anterior (BaseHTTPMiddleware)
+frente a la actual (ASGI puro), sin middleware como referencia.
+
+No usa la base de datos: el escritor de auditoría no se inicia y descarta los
+registros, así que solo se mide el costo del middleware.
+
+Uso:
+    python -m benchmarks.bench_audit_middleware
+    python -m benchmarks.bench_audit_middleware --clientes 100 --peticiones 20000
+"""
+from benchmarks.common import load, throughput
+from datetime import datetime
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from src.core.audit_middleware import AuditMiddleware
+from src.core.audit_writer import audit_writer
+from src.core.security import create_access_token, decode_access_token
+import argparse
+import asyncio
+import httpx
+import json
+import time
+
+
+class AuditMiddlewareAnterior(BaseHTTPMiddleware):
+    """La versión anterior: lee el cuerpo completo y pasa por call_next"""
+    
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        method = request.method
+        payload = None
+        if method in ["POST", "PATCH", "PUT"]:
+            body = await request.body()
+            request._body = body
+            if body and len(body) < 10000:
+                try:
+                    payload = json.loads(body.decode())
+                except ValueError:
+                    payload = {"_note": "Binary or non-JSON data"}
+        
+        usuario_id = None
+        auth_header = request.headers.get("authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            claims = decode_access_token(auth_header.split(" ")[1])
+            if claims and "sub" in claims:
+                usuario_id = int(claims["sub"])
+        
+        response = await call_next(request)
+        audit_writer.enqueue({
+            "usuario_id": usuario_id,
+            "endpoint": request.url.path,
+            "metodo_http": method,
+            "payload": payload,
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("user-agent"),
+            "status_code": response.status_code,
+            "response_time_ms": int((time.time() - start_time) * 1000),
+            "created_at": datetime.utcnow()
+        })
+        return response
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/api/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id, "nombre": f"Producto {item_id}", "precio": 10.5}
+    
+    @app.post("/api/items")
+    async def create_item(request: Request):
+        return {"recibido": len(await request.body())}
+    
+    @app.get("/api/export")
+    async def export():
+        async def rows():
+            for i in range(1000):
+                yield f"{i},Producto {i},10.50\n".encode()
+        return StreamingResponse(rows(), media_type="text/csv")
+    
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+async def run_variant(app: FastAPI, clientes: int, peticiones: int, headers: dict) -> dict:
+    body = json.dumps({"nombre": "Producto", "descripcion": "x" * 2000, "precio": 10.5})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        escenarios = {
+            "GET JSON": lambda i: client.get(f"/api/items/{i}"),
+            "POST JSON": lambda i: client.post("/api/items", content=body, headers={"content-type": "application/json"}),
+            "GET streaming": lambda i: client.get("/api/export"),
+        }
+        resultados = {}
+        for nombre, request in escenarios.items():
+            await load(request, clientes, min(peticiones, 200))  # calentamiento
+            resultados[nombre] = await load(request, clientes, peticiones)
+        return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del middleware de auditoría")
+    parser.add_argument("--clientes", type=int, default=50, help="Clientes concurrentes")
+    parser.add_argument("--peticiones", type=int, default=3000, help="Peticiones por escenario")
+    args = parser.parse_args()
+    
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': '1'})}"}
+    variantes = {
+        "sin middleware": None,
+        "anterior (BaseHTTPMiddleware)": AuditMiddlewareAnterior,
+        "actual (ASGI puro)": AuditMiddleware,
+    }
+    
+    resultados = {}
+    for nombre, middleware in variantes.items():
+        print(f"⏳ {nombre}...")
+        resultados[nombre] = asyncio.run(run_variant(build_app(middleware), args.clientes, args.peticiones, headers))
+    
+    for escenario in next(iter(resultados.values())):
+        print(f"\n📊 {escenario} ({args.clientes} clientes, {args.peticiones} peticiones)")
+        for nombre in variantes:
+            print(f"   {nombre:30} {throughput(*resultados[nombre][escenario])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Recalcula la tabla ventas_diarias a partir de pedidos y pagos.
+
+Uso:
+    python rebuild_ventas_diarias.py                       # todo el historial
+    python rebuild_ventas_diarias.py --desde 2026-01-01 --hasta 2026-01-31
+"""
+import argparse
+from datetime import date
+from sqlalchemy import func
+from src.core.database import SessionLocal
+from src.modules.orders.model import Pedido
+from src.modules.orders.rollup_service import RollupService
+import src.main  # noqa: F401 - registra todos los modelos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcular ventas_diarias")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Fecha inicial (YYYY-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Fecha final inclusive (YYYY-MM-DD)")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        desde, hasta = args.desde, args.hasta
+        if desde is None:
+            primera = db.query(func.min(Pedido.fecha_pedido)).scalar()
+            desde = primera.date() if primera else date.today()
+        if hasta is None:
+            hasta = date.today()
+        
+        dias = RollupService.rebuild(db, desde, hasta)
+        db.commit()
+        print(f"✅ ventas_diarias recalculada: {dias} días con actividad entre {desde} y {hasta}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al recalcular ventas_diarias: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field, validator
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 
 
@@ -14,9 +14,23 @@ class Settings(BaseSettings):
     DB_USER: str = Field(default="postgres", description="Database user")
     DB_PASSWORD: str = Field(default="", description="Database password - MUST BE SET IN .env")
     
+    # Connection pool
+    # Each process opens up to DB_POOL_SIZE + DB_MAX_OVERFLOW sync connections plus
+    # DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW async ones (30 with the defaults)
+    DB_POOL_SIZE: int = Field(default=5, description="Connections kept open in the pool")
+    DB_MAX_OVERFLOW: int = Field(default=10, description="Extra connections allowed under burst load")
+    DB_ASYNC_POOL_SIZE: int = Field(default=5, description="Connections kept open in the async pool (read endpoints)")
+    DB_ASYNC_MAX_OVERFLOW: int = Field(default=10, description="Extra async connections allowed under burst load")
+    DB_POOL_TIMEOUT: float = Field(default=30, description="Seconds to wait for a free connection")
+    DB_POOL_RECYCLE: int = Field(default=1800, description="Seconds before a connection is replaced (-1 disables)")
+    DB_POOL_PRE_PING: bool = Field(default=True, description="Check connections before handing them out")
+    
     # Alternative: Full DATABASE_URL (overrides individual components if provided)
     DATABASE_URL: Optional[str] = Field(default=None, description="Complete database URL")
     
+    # Async driver URL for the read endpoints (derived from DATABASE_URL if not provided)
+    ASYNC_DATABASE_URL: Optional[str] = Field(default=None, description="Database URL for the asyncpg driver")
+    
     # Security - Must be changed in production
     SECRET_KEY: str = Field(
         default="INSECURE_DEFAULT_CHANGE_THIS",
@@ -25,9 +39,60 @@ class Settings(BaseSettings):
     ALGORITHM: str = Field(default="HS256", description="JWT algorithm")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30, description="Token expiration time")
     
+    # Password hashing (existing hashes are upgraded on login when the cost changes)
+    BCRYPT_ROUNDS: int = Field(default=12, ge=4, le=31, description="bcrypt cost factor for new password hashes")
+    PASSWORD_HASH_WORKERS: int = Field(default=2, ge=1, description="Threads dedicated to password hashing")
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = Field(default=5.0, description="Max seconds a login waits for a hashing thread")
+    PASSWORD_HASH_MAX_QUEUE: int = Field(default=32, ge=0, description="Max logins waiting for a hashing thread before new ones get a 503")
+    
+    # Login rate limits (token buckets)
+    LOGIN_USERNAME_BURST: int = Field(default=5, ge=1, description="Login attempts allowed at once per username")
+    LOGIN_USERNAME_PER_MINUTE: float = Field(default=5, gt=0, description="Login attempts refilled per minute per username")
+    LOGIN_IP_BURST: int = Field(default=20, ge=1, description="Login attempts allowed at once per client IP")
+    LOGIN_IP_PER_MINUTE: float = Field(default=30, gt=0, description="Login attempts refilled per minute per client IP")
+    
+    # Verified JWT cache
+    TOKEN_CACHE_TTL_SECONDS: float = Field(default=300, description="Max seconds verified token claims stay cached")
+    TOKEN_CACHE_MAX_SIZE: int = Field(default=10000, description="Max verified tokens kept in cache")
+    
+    # Authenticated user cache (id, username, role, active flag). Updates invalidate it only in the
+    # process that made them: with several workers, a role change or deactivation takes up to
+    # USER_CACHE_TTL_SECONDS to reach the others
+    USER_CACHE_TTL_SECONDS: float = Field(default=30, description="Seconds an authenticated user stays cached")
+    USER_CACHE_MAX_SIZE: int = Field(default=1000, description="Max users kept in the auth cache")
+    
+    # Public catalog cache (also invalidated on product and stock changes)
+    CATALOG_CACHE_TTL_SECONDS: float = Field(default=60, description="Seconds the rendered public catalog stays cached")
+    
+    # Summary reports (PDF/Excel)
+    REPORT_WORKERS: int = Field(default=2, ge=1, description="Processes rendering summary reports")
+    REPORT_CACHE_TTL_SECONDS: float = Field(default=600, description="Seconds a rendered report stays cached")
+    REPORT_CACHE_MAX_SIZE: int = Field(default=64, description="Max rendered reports kept in cache")
+    
+    # Streaming exports
+    EXPORT_CHUNK_SIZE: int = Field(default=1000, ge=1, description="Rows fetched per round-trip by export cursors")
+    
+    # Audit log writer
+    AUDIT_QUEUE_MAX_SIZE: int = Field(default=10000, description="Max audit records waiting to be written")
+    AUDIT_BATCH_SIZE: int = Field(default=200, description="Audit records per multi-row insert")
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = Field(default=1.0, description="Max seconds a record waits before flush")
+    
+    # Audit policy: mutations and 4xx/5xx responses are always logged
+    AUDIT_READ_SAMPLE_RATE: float = Field(default=1.0, ge=0, le=1, description="Fraction of successful reads logged")
+    AUDIT_ROUTE_SAMPLE_RATES: Dict[str, float] = Field(default={}, description="Read sample rate per route template")
+    AUDIT_SKIP_ROUTES: List[str] = Field(default=[], description="Route templates whose successful requests are never logged")
+    
+    # Audit log partitions (archive_logs_acciones.py)
+    AUDIT_RETENTION_MONTHS: int = Field(default=12, ge=1, description="Months of audit logs kept in the database")
+    AUDIT_PARTITIONS_AHEAD: int = Field(default=3, ge=1, description="Future monthly partitions kept created")
+    AUDIT_ARCHIVE_DIR: str = Field(default="archive/logs_acciones", description="Directory for archived audit partitions")
+    AUDIT_EXACT_COUNT_THRESHOLD: int = Field(default=10000, description="Estimated audit log counts above this are not counted exactly")
+    
     # App
     APP_NAME: str = Field(default="Sistema de Gestión de Pedidos", description="Application name")
     DEBUG: bool = Field(default=False, description="Debug mode - should be False in production")
+    LOG_LEVEL: str = Field(default="INFO", description="Logging level (DEBUG, INFO, WARNING, ERROR)")
+    REQUEST_LOG_SAMPLE_RATE: float = Field(default=0.01, ge=0, le=1, description="Fraction of requests with a timing log line")
     
     @validator("DATABASE_URL", pre=True, always=True)
     def assemble_db_url(cls, v, values):
@@ -50,6 +115,18 @@ class Settings(BaseSettings):
         
         return f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
     
+    @validator("ASYNC_DATABASE_URL", pre=True, always=True)
+    def assemble_async_db_url(cls, v, values):
+        """Use the asyncpg driver on the same database as DATABASE_URL"""
+        if v:
+            return v
+        
+        url = values.get("DATABASE_URL")
+        if not url:
+            return None
+        scheme, _, rest = url.partition("://")
+        return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgresql") else url
+    
     @validator("SECRET_KEY")
     def validate_secret_key(cls, v):
         """Ensure SECRET_KEY has been changed from default"""
@@ -1,100 +1,143 @@
-"""Audit middleware to log all requests"""
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.orm import Session
-from src.core.database import SessionLocal
-from src.modules.audit.model import AuditLog
+"""Audit middleware to log requests according to the audit policy"""
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.core.audit_writer import audit_writer
+from src.core.audit_policy import audit_policy
+from src.core.security import decode_access_token
+from src.core.timing import span
 from datetime import datetime
 import json
+import logging
 import time
 
+logger = logging.getLogger(__name__)
 
-class AuditMiddleware(BaseHTTPMiddleware):
-    """Middleware to log all API requests to audit log"""
+# Only the first bytes of a request body are kept for the audit payload
+MAX_PAYLOAD_BYTES = 10000
+
+
+class AuditMiddleware:
+    """
+    Pure ASGI middleware to log API requests to audit log.
+    The request body stream is passed through untouched; only its first
+    MAX_PAYLOAD_BYTES are copied for the log, and the status code is read
+    from http.response.start, so streaming responses are not buffered.
+    Whether a request is logged is decided by `audit_policy` once the
+    response status and the matched route template are known.
+    """
+    
+    excluded_paths = ["/health", "/docs", "/redoc", "/openapi.json"]
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.route_templates = {}
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Skip audit for static files, health checks, docs
-        excluded_paths = ["/health", "/docs", "/redoc", "/openapi.json"]
-        if any(request.url.path.startswith(path) for path in excluded_paths):
-            return await call_next(request)
+        if scope["type"] != "http" or any(scope["path"].startswith(path) for path in self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
         
         # Record start time
         start_time = time.time()
         
         # Get request details
-        endpoint = request.url.path
-        method = request.method
-        ip_address = request.client.host if request.client else None
-        user_agent = request.headers.get("user-agent")
+        headers = Headers(scope=scope)
+        method = scope["method"]
+        client = scope.get("client")
+        capture_body = method in ["POST", "PATCH", "PUT"]
         
-        # Try to get payload (careful with large files)
-        payload = None
-        try:
-            if method in ["POST", "PATCH", "PUT"]:
-                # Clone body for logging
-                body = await request.body()
-                # Reset body for route handler
-                request._body = body
-                
-                # Try to parse JSON
-                if body and len(body) < 10000:  # Max 10KB for logging
-                    try:
-                        payload = json.loads(body.decode())
-                        # Remove sensitive fields
-                        if isinstance(payload, dict):
-                            for sensitive in ["password", "token", "secret"]:
-                                if sensitive in payload:
-                                    payload[sensitive] = "***REDACTED***"
-                    except:
-                        payload = {"_note": "Binary or non-JSON data"}
-        except Exception as e:
-            payload = {"_error": f"Could not parse payload: {str(e)}"}
-        
-        # Get usuario_id from token if available
-        usuario_id = None
-        try:
-            # Extract token from Authorization header
-            auth_header = request.headers.get("authorization")
-            if auth_header and auth_header.startswith("Bearer "):
-                token = auth_header.split(" ")[1]
-                # Decode token to get user_id
-                from src.core.security import decode_access_token
-                payload = decode_access_token(token)
-                if payload and "sub" in payload:
-                    try:
-                        usuario_id = int(payload["sub"])
-                    except (ValueError, TypeError):
-                        pass
-        except Exception as e:
-            print(f"Error extracting user_id from token: {str(e)}")
+        # Decode the bearer token once; routes read the claims (or None) from request.state
+        claims = self._get_claims(headers)
+        scope.setdefault("state", {})["token_claims"] = claims
+        body = bytearray()
+        body_truncated = False
+        status_code = 500
         
-        # Process request
-        response = await call_next(request)
+        async def receive_tap() -> Message:
+            nonlocal body_truncated
+            message = await receive()
+            if capture_body and message["type"] == "http.request" and not body_truncated:
+                chunk = message.get("body", b"")
+                if len(body) + len(chunk) < MAX_PAYLOAD_BYTES:
+                    body.extend(chunk)
+                else:
+                    body_truncated = True
+            return message
         
-        # Calculate response time
-        response_time_ms = int((time.time() - start_time) * 1000)
+        async def send_tap(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
         
-        # Log to database in background
         try:
-            db = SessionLocal()
-            try:
-                audit_log = AuditLog(
-                    usuario_id=usuario_id,
-                    endpoint=endpoint,
-                    metodo_http=method,
-                    payload=payload,
-                    ip_address=ip_address,
-                    user_agent=user_agent,
-                    status_code=response.status_code,
-                    response_time_ms=response_time_ms,
-                    created_at=datetime.utcnow()
-                )
-                db.add(audit_log)
-                db.commit()
-            finally:
-                db.close()
+            await self.app(scope, receive_tap, send_tap)
+        finally:
+            # Calculate response time
+            response_time_ms = int((time.time() - start_time) * 1000)
+            
+            # Hand the record to the background writer (batched insert, off the request path)
+            if audit_policy.should_audit(method, self._get_route_template(scope), status_code):
+                # After the response started: reported in the request log, not in Server-Timing
+                with span("audit"):
+                    audit_writer.enqueue({
+                        "usuario_id": self._get_usuario_id(claims),
+                        "endpoint": scope["path"],
+                        "metodo_http": method,
+                        "payload": self._parse_payload(bytes(body)) if capture_body and not body_truncated else None,
+                        "ip_address": client[0] if client else None,
+                        "user_agent": headers.get("user-agent"),
+                        "status_code": status_code,
+                        "response_time_ms": response_time_ms,
+                        "created_at": datetime.utcnow()
+                    })
+    
+    def _get_route_template(self, scope: Scope):
+        """Path template of the route that handled the request (None if no route matched)"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return None
+        if endpoint not in self.route_templates:
+            self.route_templates[endpoint] = next(
+                (route.path for route in scope["app"].routes if getattr(route, "endpoint", None) is endpoint),
+                None
+            )
+        return self.route_templates[endpoint]
+    
+    @staticmethod
+    def _parse_payload(body: bytes):
+        """Parse the captured JSON body, redacting sensitive fields"""
+        if not body:
+            return None
+        try:
+            payload = json.loads(body.decode())
+            # Remove sensitive fields
+            if isinstance(payload, dict):
+                for sensitive in ["password", "token", "secret"]:
+                    if sensitive in payload:
+                        payload[sensitive] = "***REDACTED***"
+            return payload
+        except (UnicodeDecodeError, ValueError):
+            return {"_note": "Binary or non-JSON data"}
+    
+    @staticmethod
+    def _get_claims(headers: Headers):
+        """Verified claims of the bearer token, if any"""
+        try:
+            scheme, _, token = headers.get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return decode_access_token(token)
         except Exception as e:
-            # Don't fail request if audit logging fails
-            print(f"Audit log error: {str(e)}")
-        
-        return response
+            logger.warning("Error extracting user_id from token: %s", e)
+        return None
+    
+    @staticmethod
+    def _get_usuario_id(claims):
+        """Get usuario_id from the token claims if available"""
+        if claims and "sub" in claims:
+            try:
+                return int(claims["sub"])
+            except (ValueError, TypeError):
+                pass
+        return None
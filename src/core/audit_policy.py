@@ -0,0 +1,71 @@
+"""Which requests get an audit record"""
+import random
+from typing import Dict, List, Optional
+from src.config.settings import get_settings
+
+settings = get_settings()
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class AuditPolicy:
+    """
+    Audit decision per request, by route template (e.g. /api/orders/{order_id}):
+    - error responses (4xx/5xx) are always logged; 2xx and 3xx (e.g. 304) count as success
+    - successful requests to routes in `skip_routes` are not logged
+    - mutations (any method other than GET/HEAD/OPTIONS) are always logged
+    - reads are logged with probability `route_sample_rates[template]`,
+      falling back to `read_sample_rate`
+    """
+    
+    def __init__(self, read_sample_rate: float, route_sample_rates: Dict[str, float], skip_routes: List[str]):
+        self.read_sample_rate = read_sample_rate
+        self.route_sample_rates = dict(route_sample_rates)
+        self.skip_routes = set(skip_routes)
+        self.stats = {
+            "requests": 0,
+            "audited": 0,
+            "audited_errors": 0,
+            "audited_mutations": 0,
+            "audited_reads": 0,
+            "skipped_routes": 0,
+            "sampled_out": 0,
+        }
+    
+    def should_audit(self, method: str, route: Optional[str], status_code: int) -> bool:
+        self.stats["requests"] += 1
+        
+        if status_code >= 400:
+            reason = "audited_errors"
+        elif route in self.skip_routes:
+            self.stats["skipped_routes"] += 1
+            return False
+        elif method not in READ_METHODS:
+            reason = "audited_mutations"
+        elif random.random() < self.route_sample_rates.get(route, self.read_sample_rate):
+            reason = "audited_reads"
+        else:
+            self.stats["sampled_out"] += 1
+            return False
+        
+        self.stats[reason] += 1
+        self.stats["audited"] += 1
+        return True
+    
+    def metrics(self) -> dict:
+        """Configured policy plus decision counters"""
+        requests = self.stats["requests"]
+        return {
+            "read_sample_rate": self.read_sample_rate,
+            "route_sample_rates": self.route_sample_rates,
+            "skip_routes": sorted(self.skip_routes),
+            **self.stats,
+            "audited_fraction": round(self.stats["audited"] / requests, 4) if requests else 0.0,
+        }
+
+
+audit_policy = AuditPolicy(
+    read_sample_rate=settings.AUDIT_READ_SAMPLE_RATE,
+    route_sample_rates=settings.AUDIT_ROUTE_SAMPLE_RATES,
+    skip_routes=settings.AUDIT_SKIP_ROUTES
+)
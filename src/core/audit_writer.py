@@ -0,0 +1,135 @@
+"""Background writer that batches audit log inserts"""
+import asyncio
+import logging
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+from src.config.settings import get_settings
+from src.core.database import SessionLocal
+from src.modules.audit.model import AuditLog
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class AuditWriter:
+    """
+    Bounded in-process queue of audit records.
+    A worker task flushes them as multi-row inserts when a batch fills up
+    or the flush interval elapses, so requests never wait on the audit insert.
+    """
+    
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = None
+        self.task = None
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "max_queue_depth": 0,
+        }
+    
+    def enqueue(self, record: dict):
+        """Queue a record without blocking; drop it if the queue is full"""
+        if self.queue is None:
+            self.stats["dropped"] += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return
+        self.stats["enqueued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue.qsize())
+    
+    async def start(self):
+        """Create the queue and the flush worker (on application startup)"""
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self.task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the worker and drain every queued record (on application shutdown)"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        
+        while not self.queue.empty():
+            await self._flush(self._take(self.batch_size))
+    
+    def metrics(self) -> dict:
+        """Counters plus current queue depth"""
+        return {
+            **self.stats,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+        }
+    
+    def _take(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                # Wait for the first record, then collect until the batch is full or the interval ends
+                batch.append(await self.queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                pending, batch = batch, []
+                await self._flush(pending)
+        except asyncio.CancelledError:
+            # Records already taken off the queue still get written on shutdown
+            await self._flush(batch)
+            raise
+    
+    async def _flush(self, batch: list):
+        if not batch:
+            return
+        try:
+            await run_in_threadpool(self._write, batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            # Don't let audit failures stop the worker
+            self.stats["failed_batches"] += 1
+            self.stats["dropped"] += len(batch)
+            logger.error("Audit log error: %s", e)
+    
+    @staticmethod
+    def _write(batch: list):
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+        finally:
+            db.close()
+
+
+audit_writer = AuditWriter(
+    max_size=settings.AUDIT_QUEUE_MAX_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+)
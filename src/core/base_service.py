@@ -1,11 +1,32 @@
 """Base service with common CRUD operations"""
-from typing import TypeVar, Generic, Type
+from typing import TypeVar, Generic, Type, Optional
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from datetime import datetime
+import base64
+import json
 
 T = TypeVar('T')
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(entity) -> str:
+    """Build an opaque cursor from the (created_at, id) of the last row of a page"""
+    raw = json.dumps([entity.created_at.isoformat(), entity.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Read (created_at, id) back from a cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, entity_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(entity_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 class BaseService(Generic[T]):
     """Generic base service for CRUD operations"""
@@ -13,6 +34,29 @@ class BaseService(Generic[T]):
     def __init__(self, model: Type[T]):
         self.model = model
     
+    @staticmethod
+    def keyset(query, model, limit: int, cursor: Optional[str]):
+        """
+        Seek pagination on (created_at, id), newest first.
+        An empty cursor returns the first page.
+        """
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            # The plain bound lets the planner use created_at indexes and prune partitions
+            query = query.filter(
+                model.created_at <= created_at,
+                tuple_(model.created_at, model.id) < tuple_(created_at, last_id)
+            )
+        return query.order_by(None)\
+            .order_by(model.created_at.desc(), model.id.desc())\
+            .limit(limit)
+    
+    @staticmethod
+    def set_next_cursor(response: Response, items: list, limit: int, cursor: Optional[str]):
+        """Expose the cursor of the next page in a header when keyset pagination is used"""
+        if cursor is not None and items and len(items) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1])
+    
     def get_by_id(self, db: Session, id: int, error_msg: str = "Resource not found") -> T:
         """Get entity by ID"""
         entity = db.query(self.model).filter(self.model.id == id).first()
@@ -20,9 +64,12 @@ class BaseService(Generic[T]):
             raise HTTPException(status_code=404, detail=error_msg)
         return entity
     
-    def list_all(self, db: Session, skip: int = 0, limit: int = 100):
-        """List all entities with pagination"""
-        return db.query(self.model).offset(skip).limit(limit).all()
+    def list_all(self, db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+        """List all entities with offset or cursor pagination"""
+        query = db.query(self.model)
+        if cursor is not None:
+            return self.keyset(query, self.model, limit, cursor).all()
+        return query.offset(skip).limit(limit).all()
     
     def create(self, db: Session, data: dict) -> T:
         """Create new entity"""
@@ -1,83 +1,164 @@
 """Dependencies for FastAPI routes"""
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from src.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import NamedTuple, Optional
+from src.core.database import get_db, get_async_db
 from src.core.security import decode_access_token
+from src.core.cache import TTLCache
+from src.core.timing import span
+from src.config.settings import get_settings
 from src.modules.users.model import Usuario
+import logging
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+class CurrentUser(NamedTuple):
+    """The authenticated user as requests see it: only what authorization needs"""
+    id: int
+    username: str
+    rol: str
+    is_active: bool
+    
+    @classmethod
+    def from_model(cls, user: Usuario) -> "CurrentUser":
+        return cls(id=user.id, username=user.username, rol=user.rol, is_active=user.is_active)
+
+
+# Authenticated users by id, as CurrentUser; UserService invalidates entries on update/deactivation
+# in this process only, other workers see the change after USER_CACHE_TTL_SECONDS at most
+user_cache = TTLCache(max_size=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
 def get_current_user(
     request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> Usuario:
+) -> CurrentUser:
     """Get current authenticated user"""
-    credentials_exception = HTTPException(
+    with span("auth"):
+        user = _authenticate(request, token, db)
+    
+    # Store user in request state for audit middleware
+    request.state.user = user
+    
+    return user
+
+
+def _authenticate(request: Request, token: str, db: Session) -> CurrentUser:
+    user_id = _token_user_id(request, token)
+    
+    # Most requests are served from the user cache without touching the DB
+    user = _cached_user(user_id)
+    if user is None:
+        user = _remember_user(user_id, db.query(Usuario).filter(Usuario.id == user_id).first())
+    
+    return _ensure_active(user)
+
+
+async def get_current_user_async(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    """Get current authenticated user (async session)"""
+    with span("auth"):
+        user_id = _token_user_id(request, token)
+        user = _cached_user(user_id)
+        if user is None:
+            result = await db.execute(select(Usuario).where(Usuario.id == user_id))
+            user = _remember_user(user_id, result.scalar_one_or_none())
+        user = _ensure_active(user)
+    
+    # Store user in request state for audit middleware
+    request.state.user = user
+    
+    return user
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    payload = decode_access_token(token)
-    print(f"[DEBUG] Decoded payload: {payload}")
+
+
+def _token_user_id(request: Request, token: str) -> int:
+    # Claims already verified by the audit middleware for this request
+    if hasattr(request.state, "token_claims"):
+        payload = request.state.token_claims
+    else:
+        payload = decode_access_token(token)
     
     if payload is None:
-        print("[DEBUG] Payload is None")
-        raise credentials_exception
+        logger.debug("Rejected token: invalid or expired")
+        raise _credentials_exception()
     
     user_id = payload.get("sub")
-    print(f"[DEBUG] User ID from token: {user_id} (type: {type(user_id)})")
-    
     if user_id is None:
-        print("[DEBUG] User ID is None")
-        raise credentials_exception
+        logger.debug("Rejected token: missing sub claim")
+        raise _credentials_exception()
     
     # Convert to int if it's a string
     try:
-        user_id = int(user_id)
+        return int(user_id)
     except (ValueError, TypeError):
-        print(f"[DEBUG] Could not convert user_id to int: {user_id}")
-        raise credentials_exception
-    
-    user = db.query(Usuario).filter(Usuario.id == user_id).first()
-    print(f"[DEBUG] User from DB: {user}")
-    
+        logger.debug("Rejected token: non-numeric sub claim %r", user_id)
+        raise _credentials_exception()
+
+
+def _cached_user(user_id: int) -> Optional[CurrentUser]:
+    return user_cache.get(user_id)
+
+
+def _remember_user(user_id: int, user: Optional[Usuario]) -> CurrentUser:
     if user is None:
-        print("[DEBUG] User not found in DB")
-        raise credentials_exception
+        logger.debug("Rejected token: user %s not found", user_id)
+        raise _credentials_exception()
     
+    current_user = CurrentUser.from_model(user)
+    user_cache.set(user_id, current_user)
+    return current_user
+
+
+def _ensure_active(user: CurrentUser) -> CurrentUser:
     if not user.is_active:
-        print("[DEBUG] User is not active")
+        logger.debug("Rejected token: user %s is inactive", user.id)
         raise HTTPException(status_code=400, detail="Inactive user")
-    
-    print(f"[DEBUG] User authenticated: {user.username}")
-    
-    # Store user in request state for audit middleware
-    request.state.user = user
-    
     return user
 
 
+def _check_role(current_user: CurrentUser, allowed_roles: list[str]) -> CurrentUser:
+    # Case-insensitive role comparison
+    user_rol_lower = current_user.rol.lower()
+    allowed_roles_lower = [r.lower() for r in allowed_roles]
+    
+    if user_rol_lower not in allowed_roles_lower:
+        logger.debug("User %s with role %r denied, requires %s", current_user.username, current_user.rol, allowed_roles)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Permission denied. Required roles: {', '.join(allowed_roles)}"
+        )
+    return current_user
+
+
 def require_role(allowed_roles: list[str]):
     """Dependency to check user role"""
-    def role_checker(current_user: Usuario = Depends(get_current_user)):
-        print(f"[DEBUG] Checking role - User: {current_user.username}")
-        print(f"[DEBUG] User role: '{current_user.rol}' (type: {type(current_user.rol)})")
-        print(f"[DEBUG] Allowed roles: {allowed_roles}")
-        
-        # Case-insensitive role comparison
-        user_rol_lower = current_user.rol.lower()
-        allowed_roles_lower = [r.lower() for r in allowed_roles]
-        
-        print(f"[DEBUG] Role in allowed? {user_rol_lower in allowed_roles_lower}")
-        
-        if user_rol_lower not in allowed_roles_lower:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Permission denied. Required roles: {', '.join(allowed_roles)}"
-            )
-        return current_user
+    def role_checker(current_user: CurrentUser = Depends(get_current_user)):
+        return _check_role(current_user, allowed_roles)
+    return role_checker
+
+
+def require_role_async(allowed_roles: list[str]):
+    """Dependency to check user role on routes using the async session"""
+    async def role_checker(current_user: CurrentUser = Depends(get_current_user_async)):
+        return _check_role(current_user, allowed_roles)
     return role_checker
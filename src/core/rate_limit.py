@@ -0,0 +1,49 @@
+"""In-memory token bucket rate limiting"""
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key (username, IP...): `burst` tokens, refilled at
+    `per_minute` tokens per minute. Idle buckets are evicted LRU beyond `max_keys`.
+    """
+    
+    def __init__(self, burst: int, per_minute: float, max_keys: int = 10000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+        self.allowed = 0
+        self.limited = 0
+    
+    def acquire(self, key) -> float:
+        """Take a token for `key`; returns 0 if allowed, else the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate if self.rate else float("inf")
+                self.limited += 1
+            
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+    
+    def stats(self) -> dict:
+        return {
+            "burst": self.burst,
+            "per_minute": self.rate * 60,
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
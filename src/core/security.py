@@ -1,12 +1,26 @@
 """Security utilities for authentication and authorization"""
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
+import asyncio
 import bcrypt
+import hashlib
+import logging
+import math
+import time
 from src.config.settings import get_settings
+from src.core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Claims of recently verified tokens by token hash; entries never outlive the token
+token_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash using bcrypt"""
@@ -23,11 +37,125 @@ def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt"""
     # Convert to bytes and hash
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
 
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different bcrypt cost than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool so logins can't exhaust the
+    request threadpool. At most `max_queue` jobs wait behind the workers; past
+    that, and for jobs that waited longer than `queue_timeout`, the login gets
+    a 503 instead.
+    """
+    
+    def __init__(self, workers: int, queue_timeout: float, max_queue: int):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = Lock()
+        self._slots = BoundedSemaphore(workers + max_queue)
+        self.pending = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+    
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+    
+    def _run(self, submitted_at: float, fn, args):
+        waited = time.monotonic() - submitted_at
+        with self._lock:
+            if waited > self.queue_timeout:
+                self.rejected += 1
+                return None, False
+            self.started += 1
+            self.total_wait += waited
+        try:
+            return fn(*args), True
+        finally:
+            with self._lock:
+                self.completed += 1
+    
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, try again later",
+            headers={"Retry-After": str(math.ceil(self.queue_timeout))}
+        )
+    
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the hashing pool, or raise 503 if the queue is full or too slow"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise self._busy()
+        
+        with self._lock:
+            self.pending += 1
+        try:
+            try:
+                future = self.executor().submit(self._run, time.monotonic(), fn, args)
+            except BaseException:
+                self._slots.release()
+                raise
+            # The slot is freed when the job leaves the pool, even if this request is cancelled
+            future.add_done_callback(lambda done: self._slots.release())
+            result, ran = await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                self.pending -= 1
+        
+        if not ran:
+            raise self._busy()
+        return result
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+    
+    async def hash(self, password: str) -> str:
+        return await self.run(get_password_hash, password)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_timeout_seconds": self.queue_timeout,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_queue_wait_ms": round(self.total_wait / self.started * 1000, 2) if self.started else 0.0,
+            }
+    
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -42,17 +170,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and verify JWT token"""
+    """Decode and verify JWT token, reusing the claims of recently verified tokens"""
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    cached = token_cache.get(token_hash)
+    if cached is not None:
+        return cached
+    
     try:
-        print(f"[DEBUG] Decoding token: {token[:50]}...")
-        print(f"[DEBUG] SECRET_KEY: {settings.SECRET_KEY[:20]}...")
-        print(f"[DEBUG] ALGORITHM: {settings.ALGORITHM}")
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        print(f"[DEBUG] Decoded successfully: {payload}")
+        
+        remaining = payload.get("exp", 0) - time.time()
+        if remaining > 0:
+            token_cache.set(token_hash, payload, ttl=min(remaining, settings.TOKEN_CACHE_TTL_SECONDS))
         return payload
     except JWTError as e:
-        print(f"[DEBUG] JWT Error: {e}")
+        logger.debug("JWT error: %s", e)
         return None
-    except Exception as e:
-        print(f"[DEBUG] Unexpected error: {e}")
+    except Exception:
+        logger.exception("Unexpected error decoding token")
         return None
@@ -0,0 +1,74 @@
+"""Row streaming for large exports: server-side cursors, no ORM identity map"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterator, Optional
+from sqlalchemy.orm import Session
+from src.core.database import SessionLocal
+from src.config.settings import get_settings
+import csv
+import io
+import json
+
+settings = get_settings()
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+
+def date_range_filters(column, desde: Optional[date], hasta: Optional[date]) -> list:
+    """Inclusive date range on a DateTime column"""
+    filters = []
+    if desde:
+        filters.append(column >= datetime.combine(desde, time.min))
+    if hasta:
+        filters.append(column < datetime.combine(hasta + timedelta(days=1), time.min))
+    return filters
+
+
+def stream_rows(db: Session, query) -> Iterator[list]:
+    """
+    Read a column select through a server-side cursor, yielding one list of
+    plain rows per `EXPORT_CHUNK_SIZE` round-trip.
+    """
+    result = db.execute(query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE))
+    yield from result.partitions()
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stream_ndjson(query) -> Iterator[bytes]:
+    """One JSON object per row, keyed by the select's column labels"""
+    db = SessionLocal()
+    try:
+        keys = list(query.selected_columns.keys())
+        for rows in stream_rows(db, query):
+            yield "".join(
+                json.dumps(dict(zip(keys, row)), default=_json_default, ensure_ascii=False) + "\n"
+                for row in rows
+            ).encode()
+    finally:
+        db.close()
+
+
+def stream_csv(query) -> Iterator[bytes]:
+    """CSV with a header row of the select's column labels"""
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(query.selected_columns.keys())
+        for rows in stream_rows(db, query):
+            writer.writerows(rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    finally:
+        db.close()
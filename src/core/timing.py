@@ -0,0 +1,140 @@
+"""Per-request timing spans, Server-Timing header and structured request log"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import json
+import logging
+import random
+import time
+
+logger = logging.getLogger("src.request")
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Accumulated duration and count of each named span within one request"""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = {}
+    
+    def add(self, name: str, duration_ms: float):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + duration_ms, count + 1)
+    
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+    
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value, e.g. `auth;dur=0.4, db;dur=3.1;desc="2 calls"`.
+        Built when the response starts: spans recorded later (the `audit` enqueue,
+        work done while streaming a body) only appear in the request log line.
+        """
+        parts = []
+        for name, (total, count) in self.spans.items():
+            part = f"{name};dur={total:.1f}"
+            if count > 1:
+                part += f';desc="{count} calls"'
+            parts.append(part)
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record(name: str, duration_ms: float):
+    """Add a measured duration to the current request, if any"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, duration_ms)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block of code as part of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000)
+
+
+def instrument_engine(engine):
+    """Record every DB statement of a request in the `db` span"""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        record("db", (time.perf_counter() - start) * 1000)
+    
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Failed statements never reach after_cursor_execute: drop their start time here
+        conn = context.connection
+        if conn is not None and context.execution_context is not None and conn.info.get("query_start"):
+            start = conn.info["query_start"].pop()
+            record("db", (time.perf_counter() - start) * 1000)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records its rendering in the `serialize` span"""
+    
+    def render(self, content) -> bytes:
+        with span("serialize"):
+            return super().render(content)
+
+
+class TimingMiddleware:
+    """
+    Opens the span context of each request, adds a Server-Timing header
+    and writes a sampled structured log line when the request ends.
+    """
+    
+    def __init__(self, app: ASGIApp, log_sample_rate: float = 1.0):
+        self.app = app
+        self.log_sample_rate = log_sample_rate
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status_code = 500
+        
+        async def send_with_header(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _current.reset(token)
+            if logger.isEnabledFor(logging.INFO) and random.random() < self.log_sample_rate:
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(timings.elapsed_ms(), 2),
+                    "spans": {
+                        name: {"ms": round(total, 2), "count": count}
+                        for name, (total, count) in timings.spans.items()
+                    },
+                }))
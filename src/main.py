@@ -1,9 +1,20 @@
 """FastAPI main application"""
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
+import logging
 from fastapi.middleware.cors import CORSMiddleware
 from src.config.settings import get_settings
 from src.core.audit_middleware import AuditMiddleware
+from src.core.audit_writer import audit_writer
+from src.core.audit_policy import audit_policy
+from src.core.timing import TimingMiddleware, TimedJSONResponse
+from src.core.database import engine, async_engine
+from src.core.pool_stats import pool_stats, async_pool_stats
+from src.core.deps import user_cache, require_role
+from src.core.security import token_cache, password_hasher
+from src.modules.products.service import catalog_cache
+from src.modules.orders.report_service import ReportService, report_cache
 from src.modules.auth.routes import router as auth_router
+from src.modules.auth.service import username_limiter, ip_limiter
 from src.modules.users.routes import router as users_router
 from src.modules.products.routes import router as products_router
 from src.modules.clients.routes import router as clients_router
@@ -14,9 +25,15 @@ from src.modules.devoluciones.routes import router as devoluciones_router
 
 settings = get_settings()
 
+logging.basicConfig(
+    level=settings.LOG_LEVEL.upper(),
+    format="%(asctime)s %(levelname)s [%(name)s] %(message)s"
+)
+
 app = FastAPI(
     title=settings.APP_NAME,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    default_response_class=TimedJSONResponse
 )
 
 # CORS middleware (must be first)
@@ -26,11 +43,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Audit middleware (logs all requests)
 app.add_middleware(AuditMiddleware)
 
+# Timing middleware (outermost: Server-Timing header and request log)
+app.add_middleware(TimingMiddleware, log_sample_rate=settings.REQUEST_LOG_SAMPLE_RATE)
+
+@app.on_event("startup")
+async def start_audit_writer():
+    await audit_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    """Flush pending audit records before exit"""
+    await audit_writer.stop()
+
+
+@app.on_event("shutdown")
+def stop_report_pool():
+    ReportService.shutdown()
+
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.shutdown()
+
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(users_router)
@@ -56,3 +98,38 @@ def root():
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/health/db")
+def db_health(current_user = Depends(require_role(["admin"]))):
+    """Connection pool usage, overflow and checkout wait times (sync pool, async pool under "async")"""
+    return {
+        **pool_stats.snapshot(engine.pool),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout_seconds": settings.DB_POOL_TIMEOUT,
+        "async": {
+            **async_pool_stats.snapshot(async_engine.pool),
+            "max_overflow": settings.DB_ASYNC_MAX_OVERFLOW,
+        },
+    }
+
+
+@app.get("/health/audit")
+def audit_health(current_user = Depends(require_role(["admin"]))):
+    """Audit policy decisions, writer queue and throughput counters"""
+    return {**audit_writer.metrics(), "policy": audit_policy.metrics()}
+
+
+@app.get("/health/auth")
+def auth_health(current_user = Depends(require_role(["admin"]))):
+    """Password hashing pool and login rate limiter counters"""
+    return {
+        "password_hasher": password_hasher.stats(),
+        "rate_limits": {"username": username_limiter.stats(), "ip": ip_limiter.stats()},
+    }
+
+
+@app.get("/health/cache")
+def cache_health(current_user = Depends(require_role(["admin"]))):
+    """Hit/miss counters of the in-process caches"""
+    return {"users": user_cache.stats(), "tokens": token_cache.stats(), "catalog": catalog_cache.stats(), "reports": report_cache.stats()}
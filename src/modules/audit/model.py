@@ -1,15 +1,18 @@
 """AuditLog model - based on existing logs_acciones table"""
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.core.database import Base
 
 
 class AuditLog(Base):
+    """Range-partitioned by month on created_at (migration 0003)"""
     __tablename__ = "logs_acciones"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
     
-    id = Column(Integer, primary_key=True, index=True)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True, index=True)
+    # The partition key is part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
     endpoint = Column(String(200), nullable=False)
     metodo_http = Column(String(10), nullable=False)
     payload = Column(JSON, nullable=True)
@@ -17,7 +20,17 @@ class AuditLog(Base):
     user_agent = Column(Text, nullable=True)
     status_code = Column(Integer, nullable=True)
     response_time_ms = Column(Integer, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True)
     
     # Relationship
     usuario = relationship("Usuario", backref="logs")
+
+
+# Filter + newest-first indexes for the audit log queries (migration 0004).
+# Endpoint uses the "C" collation so prefix searches are plain range scans.
+Index("ix_logs_acciones_usuario_created", AuditLog.usuario_id, AuditLog.created_at)
+Index("ix_logs_acciones_metodo_created", AuditLog.metodo_http, AuditLog.created_at)
+Index("ix_logs_acciones_status_created", AuditLog.status_code, AuditLog.created_at)
+Index("ix_logs_acciones_endpoint_created", AuditLog.endpoint.collate("C"), AuditLog.created_at)
+# Newest-first keyset pagination (migration 0006)
+Index("ix_logs_acciones_created_id", AuditLog.created_at.desc(), AuditLog.id.desc())
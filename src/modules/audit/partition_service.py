@@ -0,0 +1,178 @@
+"""Monthly partitions of logs_acciones: creation ahead of time, retention and archival"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import List, Optional
+import gzip
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "logs_acciones"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_NAME = re.compile(r"^logs_acciones_(\d{4})_(\d{2})$")
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class AuditPartitionService:
+    """Maintenance of the month partitions created by migration 0003"""
+    
+    @staticmethod
+    def partition_name(month: date) -> str:
+        return f"{PARENT_TABLE}_{month:%Y_%m}"
+    
+    @staticmethod
+    def partition_names(db: Session) -> List[str]:
+        """Names of the partitions currently attached to the parent table"""
+        return list(db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+        """), {"parent": PARENT_TABLE}).scalars())
+    
+    @staticmethod
+    def list_partitions(db: Session) -> List[date]:
+        """Months that currently have an attached partition, oldest first"""
+        months = []
+        for name in AuditPartitionService.partition_names(db):
+            match = PARTITION_NAME.match(name)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(months)
+    
+    @staticmethod
+    def default_months(db: Session) -> List[date]:
+        """Months that have rows in the DEFAULT partition, oldest first"""
+        months = db.execute(text(
+            f"SELECT DISTINCT date_trunc('month', created_at) FROM {DEFAULT_PARTITION}"
+        )).scalars()
+        return sorted(month.date() for month in months)
+    
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: int) -> List[str]:
+        """
+        Create the partitions of the current month, the next `months_ahead` months
+        and every month that has rows in DEFAULT (e.g. after a missed run).
+        DEFAULT is detached meanwhile and its rows are moved to their new partitions.
+        """
+        has_default = DEFAULT_PARTITION in AuditPartitionService.partition_names(db)
+        existing = set(AuditPartitionService.list_partitions(db))
+        current = month_start(date.today())
+        months = {add_months(current, offset) for offset in range(months_ahead + 1)}
+        
+        stray = []
+        if has_default:
+            stray = AuditPartitionService.default_months(db)
+            months.update(stray)
+        missing = sorted(months - existing)
+        if not missing:
+            db.rollback()
+            return []
+        
+        # A partition can't be created while DEFAULT holds rows of its range
+        if has_default:
+            db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+            # Rows may have landed in DEFAULT before the detach took its lock
+            stray = AuditPartitionService.default_months(db)
+            missing = sorted(set(missing).union(stray))
+        
+        created = []
+        for month in missing:
+            name = AuditPartitionService.partition_name(month)
+            db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+        
+        if has_default:
+            # Every month found in DEFAULT now has a partition, so all of its rows move
+            db.execute(text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} RETURNING *) "
+                f"INSERT INTO {PARENT_TABLE} SELECT * FROM moved"
+            ))
+            db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        db.commit()
+        
+        if stray:
+            logger.warning("Moved audit logs of %s out of %s", ", ".join(f"{m:%Y-%m}" for m in stray), DEFAULT_PARTITION)
+        return created
+    
+    @staticmethod
+    def write_archive(db: Session, query: str, path: str):
+        """COPY the rows of `query` to a gzip CSV file, replacing it only once fully written"""
+        tmp_path = f"{path}.tmp"
+        cursor = db.connection().connection.cursor()
+        try:
+            with gzip.open(tmp_path, "wb") as archive:
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+        finally:
+            cursor.close()
+        with open(tmp_path, "rb") as archive:
+            os.fsync(archive.fileno())
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def archive_partition(db: Session, month: date, archive_dir: str) -> str:
+        """
+        Copy a month partition to a gzip CSV file, then detach and drop it.
+        The table is only dropped once the file is fully written.
+        """
+        name = AuditPartitionService.partition_name(month)
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"{name}.csv.gz")
+        AuditPartitionService.write_archive(db, f"SELECT * FROM {name}", path)
+        
+        db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        
+        logger.info("Archived audit partition %s to %s", name, path)
+        return path
+    
+    @staticmethod
+    def archive_default(db: Session, cutoff: date, archive_dir: str) -> Optional[str]:
+        """Copy the DEFAULT rows older than `cutoff` to a gzip CSV file, then delete them"""
+        condition = f"created_at < '{cutoff.isoformat()}'"
+        # Keeps new rows of that range out of DEFAULT until they are deleted
+        db.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE MODE"))
+        if not db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {condition})")).scalar():
+            db.rollback()
+            return None
+        
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"{DEFAULT_PARTITION}_before_{cutoff:%Y_%m}.csv.gz")
+        AuditPartitionService.write_archive(db, f"SELECT * FROM {DEFAULT_PARTITION} WHERE {condition}", path)
+        db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {condition}"))
+        db.commit()
+        
+        logger.info("Archived audit logs before %s from %s to %s", cutoff, DEFAULT_PARTITION, path)
+        return path
+    
+    @staticmethod
+    def apply_retention(db: Session, retention_months: int, archive_dir: str) -> List[str]:
+        """Archive every partition that ends before the retention window, and the DEFAULT rows before it"""
+        cutoff = add_months(month_start(date.today()), -retention_months)
+        
+        archived = []
+        for month in AuditPartitionService.list_partitions(db):
+            if add_months(month, 1) <= cutoff:
+                archived.append(AuditPartitionService.archive_partition(db, month, archive_dir))
+        
+        if DEFAULT_PARTITION in AuditPartitionService.partition_names(db):
+            path = AuditPartitionService.archive_default(db, cutoff, archive_dir)
+            if path:
+                archived.append(path)
+        return archived
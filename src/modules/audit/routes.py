@@ -1,54 +1,82 @@
 """AuditLog API routes"""
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from src.core.database import get_db
-from src.core.deps import require_role
-from src.modules.audit.schema import AuditLogResponse
+from datetime import date
+from src.core.database import get_async_db
+from src.core.deps import require_role_async
+from src.core.base_service import BaseService
+from src.modules.audit.schema import AuditLogResponse, AuditLogFilters, AuditLogCount
 from src.modules.audit.service import AuditService
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/audit", tags=["audit"])
 
 
 @router.get("/logs", response_model=List[AuditLogResponse])
-def list_audit_logs(
+async def list_audit_logs(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    usuario_id: Optional[int] = Query(None),
-    metodo_http: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-    current_user = Depends(require_role(["admin"]))
+    cursor: Optional[str] = None,
+    filters: AuditLogFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin"]))
 ):
     """
     List all audit logs - Admin only
-    Filter by usuario_id or metodo_http if provided
+    Filter by usuario_id, metodo_http, desde/hasta, endpoint prefix or status code if provided
+    """
+    try:
+        logs = await AuditService.query_logs_async(db, filters, skip, limit, cursor)
+        BaseService.set_next_cursor(response, logs, limit, cursor)
+        return logs
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error listing audit logs")
+        raise HTTPException(status_code=500, detail="Error listing audit logs")
+
+
+@router.get("/logs/count", response_model=AuditLogCount)
+async def count_audit_logs(
+    filters: AuditLogFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin"]))
+):
+    """
+    Count audit logs matching the same filters as /logs - Admin only
+    Large totals are planner estimates (`exact` is false)
     """
     try:
-        if usuario_id or metodo_http:
-            return AuditService.filter_logs(db, usuario_id, metodo_http, skip, limit)
-        return AuditService.list_logs(db, skip, limit)
-    except Exception as e:
-        from fastapi import HTTPException, status
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
+        return await AuditService.count_logs_async(db, filters)
+    except Exception:
+        logger.exception("Error counting audit logs")
+        raise HTTPException(status_code=500, detail="Error counting audit logs")
 
 
 @router.get("/users/{usuario_id}/logs", response_model=List[AuditLogResponse])
-def get_user_audit_logs(
+async def get_user_audit_logs(
     usuario_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user = Depends(require_role(["admin"]))
+    cursor: Optional[str] = None,
+    desde: Optional[date] = Query(None),
+    hasta: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin"]))
 ):
     """Get audit logs for specific user - Admin only"""
     try:
-        return AuditService.get_user_logs(db, usuario_id, skip, limit)
-    except Exception as e:
-        from fastapi import HTTPException, status
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
+        filters = AuditLogFilters(usuario_id=usuario_id, desde=desde, hasta=hasta)
+        logs = await AuditService.query_logs_async(db, filters, skip, limit, cursor)
+        BaseService.set_next_cursor(response, logs, limit, cursor)
+        return logs
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error listing audit logs of user %s", usuario_id)
+        raise HTTPException(status_code=500, detail="Error listing audit logs")
@@ -1,9 +1,26 @@
 """AuditLog schemas"""
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field
+from datetime import date, datetime
 from typing import Optional
 
 
+class AuditLogFilters(BaseModel):
+    """Query filters for audit logs; every filter is optional"""
+    usuario_id: Optional[int] = None
+    metodo_http: Optional[str] = None
+    desde: Optional[date] = None
+    hasta: Optional[date] = None
+    endpoint: Optional[str] = Field(None, max_length=200, description="Endpoint prefix, e.g. /api/orders")
+    status_code: Optional[int] = None
+    status_min: Optional[int] = Field(None, description="Minimum status code, e.g. 500 for server errors")
+    status_max: Optional[int] = None
+
+
+class AuditLogCount(BaseModel):
+    count: int
+    exact: bool
+
+
 class AuditLogResponse(BaseModel):
     id: int
     usuario_id: Optional[int]
@@ -1,30 +1,158 @@
 """AuditLog service"""
+from sqlalchemy import select, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
 from src.modules.audit.model import AuditLog
+from src.modules.audit.schema import AuditLogFilters
 from src.modules.users.model import Usuario
-from typing import List
+from src.core.base_service import BaseService
+from src.core.streaming import date_range_filters
+from datetime import date
+from src.config.settings import get_settings
+from typing import List, Optional
+import json
+
+settings = get_settings()
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a select, compiled with its bound parameters"""
+    
+    inherit_cache = False
+    
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
 
 
 class AuditService:
     """Service for audit log operations"""
     
     @staticmethod
-    def list_logs(db: Session, skip: int = 0, limit: int = 100) -> List[AuditLog]:
-        """List all audit logs with pagination"""
+    def _paginate(query, skip: int, limit: int, cursor: Optional[str]) -> List[AuditLog]:
+        """Newest first, by offset or by cursor"""
+        if cursor is not None:
+            return BaseService.keyset(query, AuditLog, limit, cursor).all()
+        return query.order_by(AuditLog.created_at.desc())\
+            .offset(skip)\
+            .limit(limit)\
+            .all()
+    
+    @staticmethod
+    def _with_usernames(logs: List[AuditLog]) -> List[AuditLog]:
+        # Add username to logs
+        for log in logs:
+            if log.usuario:
+                log.username = log.usuario.username
+        return logs
+    
+    @staticmethod
+    def _prefix_upper_bound(prefix: str) -> Optional[str]:
+        """
+        Smallest string above every string starting with `prefix`: its last character
+        incremented. None for a trailing "/" or a last character without a valid
+        successor (U+10FFFF, or one followed by surrogates); those use LIKE prefix || '%'.
+        """
+        last = ord(prefix[-1])
+        if prefix[-1] == "/" or last == 0x10FFFF or 0xD800 <= last + 1 <= 0xDFFF:
+            return None
+        return prefix[:-1] + chr(last + 1)
+    
+    @staticmethod
+    def _conditions(filters: AuditLogFilters) -> list:
+        """WHERE clauses for the filters; each one matches a (column, created_at) index"""
+        # A date range only scans the matching monthly partitions
+        conditions = date_range_filters(AuditLog.created_at, filters.desde, filters.hasta)
+        
+        if filters.usuario_id:
+            conditions.append(AuditLog.usuario_id == filters.usuario_id)
+        
+        if filters.metodo_http:
+            conditions.append(AuditLog.metodo_http == filters.metodo_http.upper())
+        
+        if filters.endpoint:
+            # Prefix as a range in the "C" collation, so the endpoint index is used
+            # with any bind parameter (LIKE 'x%' needs a literal pattern)
+            endpoint = AuditLog.endpoint.collate("C")
+            upper = AuditService._prefix_upper_bound(filters.endpoint)
+            if upper is None:
+                conditions.append(endpoint.startswith(filters.endpoint, autoescape=True))
+            else:
+                conditions.extend([endpoint >= filters.endpoint, endpoint < upper])
+        
+        if filters.status_code is not None:
+            conditions.append(AuditLog.status_code == filters.status_code)
+        if filters.status_min is not None:
+            conditions.append(AuditLog.status_code >= filters.status_min)
+        if filters.status_max is not None:
+            conditions.append(AuditLog.status_code <= filters.status_max)
+        
+        return conditions
+    
+    @staticmethod
+    async def query_logs_async(
+        db: AsyncSession,
+        filters: AuditLogFilters,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> List[AuditLog]:
+        """List or filter audit logs (async session)"""
         try:
-            logs = db.query(AuditLog)\
+            query = select(AuditLog)\
                 .options(joinedload(AuditLog.usuario))\
-                .order_by(AuditLog.created_at.desc())\
-                .offset(skip)\
-                .limit(limit)\
-                .all()
+                .where(*AuditService._conditions(filters))
+            
+            if cursor is not None:
+                query = BaseService.keyset(query, AuditLog, limit, cursor)
+            else:
+                query = query.order_by(AuditLog.created_at.desc()).offset(skip).limit(limit)
+            
+            result = await db.scalars(query)
+            return AuditService._with_usernames(result.all())
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise Exception(f"Error al listar logs: {str(e)}")
+    
+    @staticmethod
+    async def count_logs_async(db: AsyncSession, filters: AuditLogFilters) -> dict:
+        """
+        Number of logs matching the filters.
+        Uses the planner's row estimate; only small results are counted exactly.
+        """
+        try:
+            conditions = AuditService._conditions(filters)
+            connection = await db.connection()
+            plan = (await connection.execute(Explain(select(AuditLog.id).where(*conditions)))).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
             
-            # Add username to logs
-            for log in logs:
-                if log.usuario:
-                    log.username = log.usuario.username
+            if estimate > settings.AUDIT_EXACT_COUNT_THRESHOLD:
+                return {"count": estimate, "exact": False}
             
-            return logs
+            count = await db.scalar(select(func.count()).select_from(AuditLog).where(*conditions))
+            return {"count": count, "exact": True}
+        except Exception as e:
+            raise Exception(f"Error al contar logs: {str(e)}")
+    
+    @staticmethod
+    def list_logs(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[AuditLog]:
+        """List all audit logs with pagination"""
+        try:
+            query = db.query(AuditLog).options(joinedload(AuditLog.usuario))
+            logs = AuditService._paginate(query, skip, limit, cursor)
+            return AuditService._with_usernames(logs)
+        except HTTPException:
+            raise
         except Exception as e:
             raise Exception(f"Error al listar logs: {str(e)}")
     
@@ -34,11 +162,16 @@ class AuditService:
         usuario_id: int = None,
         metodo_http: str = None,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None
     ) -> List[AuditLog]:
         """Filter audit logs"""
         try:
-            query = db.query(AuditLog).options(joinedload(AuditLog.usuario))
+            query = db.query(AuditLog)\
+                .options(joinedload(AuditLog.usuario))\
+                .filter(*date_range_filters(AuditLog.created_at, desde, hasta))
             
             if usuario_id:
                 query = query.filter(AuditLog.usuario_id == usuario_id)
@@ -46,37 +179,29 @@ class AuditService:
             if metodo_http:
                 query = query.filter(AuditLog.metodo_http == metodo_http)
             
-            logs = query.order_by(AuditLog.created_at.desc())\
-                .offset(skip)\
-                .limit(limit)\
-                .all()
-            
-            # Add username to logs
-            for log in logs:
-                if log.usuario:
-                    log.username = log.usuario.username
-            
-            return logs
+            logs = AuditService._paginate(query, skip, limit, cursor)
+            return AuditService._with_usernames(logs)
+        except HTTPException:
+            raise
         except Exception as e:
             raise Exception(f"Error al filtrar logs: {str(e)}")
     
     @staticmethod
-    def get_user_logs(db: Session, usuario_id: int, skip: int = 0, limit: int = 100) -> List[AuditLog]:
+    def get_user_logs(
+        db: Session,
+        usuario_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> List[AuditLog]:
         """Get logs for specific user"""
         try:
-            logs = db.query(AuditLog)\
+            query = db.query(AuditLog)\
                 .options(joinedload(AuditLog.usuario))\
-                .filter(AuditLog.usuario_id == usuario_id)\
-                .order_by(AuditLog.created_at.desc())\
-                .offset(skip)\
-                .limit(limit)\
-                .all()
-            
-            # Add username to logs
-            for log in logs:
-                if log.usuario:
-                    log.username = log.usuario.username
-            
-            return logs
+                .filter(AuditLog.usuario_id == usuario_id)
+            logs = AuditService._paginate(query, skip, limit, cursor)
+            return AuditService._with_usernames(logs)
+        except HTTPException:
+            raise
         except Exception as e:
             raise Exception(f"Error al obtener logs del usuario: {str(e)}")
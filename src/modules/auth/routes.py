@@ -1,7 +1,7 @@
 """Authentication routes"""
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from src.core.database import get_db
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.database import get_async_db
 from src.modules.auth.schema import LoginRequest, TokenResponse
 from src.modules.auth.service import AuthService
 
@@ -9,12 +9,14 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(
+async def login(
     credentials: LoginRequest,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login endpoint - returns JWT token"""
-    user = AuthService.authenticate_user(db, credentials.username, credentials.password)
+    client_ip = request.client.host if request.client else None
+    user = await AuthService.authenticate_user(db, credentials.username, credentials.password, client_ip)
     access_token = AuthService.create_user_token(user)
     
     return TokenResponse(
@@ -1,20 +1,48 @@
 """Authentication business logic"""
 from datetime import timedelta
-from sqlalchemy.orm import Session
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from src.modules.users.model import Usuario
-from src.core.security import verify_password, create_access_token
+from src.core.security import password_hasher, needs_rehash, create_access_token
+from src.core.rate_limit import TokenBucketLimiter
 from src.config.settings import get_settings
+import logging
+import math
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Login attempts allowed per username and per client IP
+username_limiter = TokenBucketLimiter(burst=settings.LOGIN_USERNAME_BURST, per_minute=settings.LOGIN_USERNAME_PER_MINUTE)
+ip_limiter = TokenBucketLimiter(burst=settings.LOGIN_IP_BURST, per_minute=settings.LOGIN_IP_PER_MINUTE)
+
 
 class AuthService:
+
+    @staticmethod
+    def check_rate_limits(username: str, client_ip: Optional[str]):
+        """Reject the attempt with 429 if the IP or the username is out of tokens"""
+        wait = ip_limiter.acquire(client_ip) if client_ip else 0
+        if not wait:
+            wait = username_limiter.acquire(username.lower())
+        
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
     
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> Usuario:
+    async def authenticate_user(db: AsyncSession, username: str, password: str, client_ip: Optional[str] = None) -> Usuario:
         """Authenticate user by username and password"""
-        user = db.query(Usuario).filter(Usuario.username == username).first()
+        AuthService.check_rate_limits(username, client_ip)
+        
+        result = await db.execute(select(Usuario).where(Usuario.username == username))
+        user = result.scalar_one_or_none()
         
         if not user:
             raise HTTPException(
@@ -28,14 +56,31 @@ class AuthService:
                 detail="User account is inactive"
             )
         
-        if not verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password"
             )
         
+        if needs_rehash(user.hashed_password):
+            await AuthService.rehash_password(db, user, password)
+        
         return user
     
+    @staticmethod
+    async def rehash_password(db: AsyncSession, user: Usuario, password: str):
+        """Re-hash a verified password with the current BCRYPT_ROUNDS"""
+        try:
+            hashed = await password_hasher.hash(password)
+            await db.execute(update(Usuario).where(Usuario.id == user.id).values(hashed_password=hashed))
+            await db.commit()
+        except HTTPException:
+            # Hashing pool saturated: keep the old hash, it will be upgraded on a later login
+            pass
+        except Exception:
+            await db.rollback()
+            logger.exception("Could not upgrade password hash of user %s", user.id)
+    
     @staticmethod
     def create_user_token(user: Usuario) -> str:
         """Create access token for user"""
@@ -1,5 +1,5 @@
 """Cliente models"""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.core.database import Base
@@ -24,6 +24,10 @@ class Cliente(Base):
     pedidos = relationship("Pedido", back_populates="cliente", cascade="all, delete-orphan")
 
 
+# Newest-first keyset pagination (migration 0006)
+Index("ix_clientes_created_id", Cliente.created_at.desc(), Cliente.id.desc())
+
+
 class ContactoCliente(Base):
     __tablename__ = "contactos_clientes"
     
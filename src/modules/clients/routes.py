@@ -1,9 +1,10 @@
 """Client API routes"""
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Response, status, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from src.core.database import get_db
 from src.core.deps import require_role
+from src.core.base_service import BaseService
 from src.modules.clients.schema import ClientCreate, ClientUpdate, ClientResponse
 from src.modules.clients.service import ClientService
 
@@ -12,14 +13,20 @@ router = APIRouter(prefix="/api/clients", tags=["clients"])
 
 @router.get("/", response_model=List[ClientResponse])
 def list_clients(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
 ):
     """List clients with pagination"""
     try:
-        return ClientService.list_clients(db, skip, limit)
+        clients = ClientService.list_clients(db, skip, limit, cursor)
+        BaseService.set_next_cursor(response, clients, limit, cursor)
+        return clients
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar clientes: {str(e)}")
 
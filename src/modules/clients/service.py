@@ -3,7 +3,9 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from src.modules.clients.model import Cliente, ContactoCliente
 from src.modules.clients.schema import ClientCreate, ClientUpdate
+from src.core.base_service import BaseService
 from datetime import datetime
+from typing import Optional
 
 
 class ClientService:
@@ -22,10 +24,14 @@ class ClientService:
             raise HTTPException(status_code=500, detail=f"Error al obtener cliente: {str(e)}")
     
     @staticmethod
-    def list_clients(db: Session, skip: int = 0, limit: int = 10):
-        """List clients with pagination"""
+    def list_clients(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+        """List clients with offset or cursor pagination"""
         try:
+            if cursor is not None:
+                return BaseService.keyset(db.query(Cliente), Cliente, limit, cursor).all()
             return db.query(Cliente).offset(skip).limit(limit).all()
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error al listar clientes: {str(e)}")
     
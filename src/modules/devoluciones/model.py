@@ -1,5 +1,5 @@
 """Devoluciones models"""
-from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.core.database import Base
@@ -22,3 +22,7 @@ class Devolucion(Base):
     # Relationships
     pedido = relationship("Pedido", backref="devolucion")
     usuario = relationship("Usuario")
+
+
+# Newest-first keyset pagination (migration 0006)
+Index("ix_devoluciones_created_id", Devolucion.created_at.desc(), Devolucion.id.desc())
@@ -1,11 +1,13 @@
 """Devoluciones routes"""
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
-from src.core.deps import get_db, get_current_user
+from typing import List, Optional
+from src.core.deps import get_db, get_current_user, CurrentUser
+from src.core.base_service import BaseService
 from src.modules.devoluciones.service import DevolucionService
-from src.modules.devoluciones.schema import DevolucionCreate, DevolucionResponse
-from src.modules.users.model import Usuario
+from src.modules.devoluciones.schema import (
+    DevolucionCreate, DevolucionResponse, DevolucionBulkCreate, DevolucionBulkResponse
+)
 
 router = APIRouter(prefix="/devoluciones", tags=["devoluciones"])
 
@@ -14,7 +16,7 @@ router = APIRouter(prefix="/devoluciones", tags=["devoluciones"])
 def crear_devolucion(
     devolucion: DevolucionCreate,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Crear una devolución de pedido.
@@ -26,11 +28,27 @@ def crear_devolucion(
     return DevolucionService.crear_devolucion(db, devolucion, current_user.id)
 
 
+@router.post("/bulk", response_model=DevolucionBulkResponse)
+def crear_devoluciones_bulk(
+    request: DevolucionBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Devolver muchos pedidos en una sola transacción (p. ej. retirada de un proveedor).
+    Requiere rol: admin o supervisor
+    """
+    if current_user.rol not in ["admin", "supervisor"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para realizar devoluciones")
+    
+    return DevolucionService.crear_devoluciones_bulk(db, request.devoluciones, current_user.id)
+
+
 @router.get("/pedido/{pedido_id}", response_model=DevolucionResponse)
 def obtener_devolucion_por_pedido(
     pedido_id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Obtener la devolución de un pedido específico"""
     return DevolucionService.obtener_devolucion_por_pedido(db, pedido_id)
@@ -38,10 +56,12 @@ def obtener_devolucion_por_pedido(
 
 @router.get("/", response_model=List[DevolucionResponse])
 def listar_devoluciones(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Listar todas las devoluciones.
@@ -50,4 +70,6 @@ def listar_devoluciones(
     if current_user.rol not in ["admin", "supervisor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para ver devoluciones")
     
-    return DevolucionService.listar_devoluciones(db, skip, limit)
+    devoluciones = DevolucionService.listar_devoluciones(db, skip, limit, cursor)
+    BaseService.set_next_cursor(response, devoluciones, limit, cursor)
+    return devoluciones
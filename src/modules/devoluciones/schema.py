@@ -19,6 +19,26 @@ class DevolucionCreate(BaseModel):
     descripcion: Optional[str] = None
 
 
+class DevolucionBulkCreate(BaseModel):
+    """Schema para devolver muchos pedidos en una transacción"""
+    devoluciones: List[DevolucionCreate] = Field(..., min_length=1, max_length=1000)
+
+
+class DevolucionBulkResult(BaseModel):
+    """Resultado de un pedido dentro de una devolución masiva"""
+    index: int
+    pedido_id: int
+    devolucion_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class DevolucionBulkResponse(BaseModel):
+    """Schema de respuesta de devolución masiva"""
+    created: int
+    failed: int
+    results: List[DevolucionBulkResult]
+
+
 class DevolucionResponse(BaseModel):
     """Schema de respuesta de devolución"""
     id: int
@@ -1,13 +1,22 @@
 """Devoluciones service"""
 from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, values, column, Integer
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 from src.modules.devoluciones.model import Devolucion
 from src.modules.devoluciones.schema import DevolucionCreate
 from src.modules.orders.model import Pedido, DetallePedido
 from src.modules.products.model import Producto
+from src.modules.products.service import ProductService
+from src.modules.orders.service import OrderService
 from src.modules.payments.model import Pago
+from src.modules.orders.rollup_service import RollupService
+from src.core.base_service import BaseService
 from datetime import datetime
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class DevolucionService:
@@ -19,11 +28,11 @@ class DevolucionService:
         Crea una devolución y revierte el pedido:
         - Cambia estado del pedido a 'devuelto'
         - Restaura el inventario de productos
-        - Elimina los pagos asociados
+        - Elimina las líneas y los pagos asociados
         - Registra la devolución
         """
-        # Verificar que el pedido existe
-        pedido = db.query(Pedido).filter(Pedido.id == devolucion_data.pedido_id).first()
+        # Verificar que el pedido existe (bloqueado hasta el commit)
+        pedido = DevolucionService.bloquear_pedidos(db, [devolucion_data.pedido_id]).get(devolucion_data.pedido_id)
         if not pedido:
             raise HTTPException(status_code=404, detail="Pedido no encontrado")
         
@@ -39,44 +48,10 @@ class DevolucionService:
             raise HTTPException(status_code=400, detail="Ya existe una devolución para este pedido")
         
         try:
-            # 1. Recopilar información de productos para la devolución
-            productos_devueltos = []
-            for detalle in pedido.detalles:
-                producto = db.query(Producto).filter(Producto.id == detalle.producto_id).first()
-                productos_devueltos.append({
-                    "producto_id": detalle.producto_id,
-                    "nombre": producto.nombre if producto else "Producto no encontrado",
-                    "cantidad": detalle.cantidad,
-                    "precio": float(detalle.precio_unitario)
-                })
-                
-                # 2. Restaurar inventario
-                if producto:
-                    producto.cantidad += detalle.cantidad
-            
-            # 3. Eliminar pagos asociados (reversar transacciones)
-            pagos = db.query(Pago).filter(Pago.pedido_id == pedido.id).all()
-            for pago in pagos:
-                db.delete(pago)
-            
-            # 4. Cambiar estado del pedido a 'devuelto'
-            pedido.estado = "devuelto"
-            pedido.total_pagado = 0
-            pedido.updated_at = datetime.utcnow()
-            
-            # 5. Crear registro de devolución
-            nueva_devolucion = Devolucion(
-                pedido_id=devolucion_data.pedido_id,
-                usuario_id=usuario_id,
-                motivo=devolucion_data.motivo,
-                descripcion=devolucion_data.descripcion,
-                productos_devueltos=productos_devueltos,
-                monto_total=float(pedido.total),
-                fecha_devolucion=datetime.utcnow()
-            )
-            
-            db.add(nueva_devolucion)
+            nueva_devolucion = DevolucionService.revertir_pedidos(db, [(pedido, devolucion_data)], usuario_id)[0]
             db.commit()
+            # El stock cambió: el catálogo público en caché ya no es válido
+            ProductService.invalidate_catalog()
             db.refresh(nueva_devolucion)
             
             return nueva_devolucion
@@ -88,6 +63,169 @@ class DevolucionService:
             db.rollback()
             raise HTTPException(status_code=500, detail=f"Error al crear devolución: {str(e)}")
     
+    @staticmethod
+    def crear_devoluciones_bulk(db: Session, devoluciones: List[DevolucionCreate], usuario_id: int) -> dict:
+        """
+        Devuelve muchos pedidos en una sola transacción (p. ej. retirada de un proveedor).
+        Los pedidos que no se pueden devolver se reportan y no detienen al resto.
+        """
+        pedido_ids = {devolucion_data.pedido_id for devolucion_data in devoluciones}
+        pedidos = DevolucionService.bloquear_pedidos(db, pedido_ids)
+        con_devolucion = set(db.scalars(
+            select(Devolucion.pedido_id).where(Devolucion.pedido_id.in_(pedido_ids))
+        ))
+        
+        results = []
+        accepted = []
+        for index, devolucion_data in enumerate(devoluciones):
+            result = {"index": index, "pedido_id": devolucion_data.pedido_id, "devolucion_id": None, "error": None}
+            results.append(result)
+            
+            pedido = pedidos.get(devolucion_data.pedido_id)
+            if not pedido:
+                result["error"] = "Pedido no encontrado"
+            elif pedido.estado == "devuelto":
+                result["error"] = "Este pedido ya fue devuelto"
+            elif pedido.id in con_devolucion:
+                result["error"] = "Ya existe una devolución para este pedido"
+            else:
+                # Un pedido repetido en el lote solo se devuelve una vez
+                con_devolucion.add(pedido.id)
+                accepted.append((result, pedido, devolucion_data))
+        
+        if not accepted:
+            db.rollback()
+            return {"created": 0, "failed": len(results), "results": results}
+        
+        try:
+            nuevas = DevolucionService.revertir_pedidos(
+                db, [(pedido, devolucion_data) for _, pedido, devolucion_data in accepted], usuario_id
+            )
+            for (result, _, _), devolucion in zip(accepted, nuevas):
+                result["devolucion_id"] = devolucion.id
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Error al procesar devoluciones en lote")
+            raise HTTPException(status_code=500, detail="Error al procesar devoluciones")
+        ProductService.invalidate_catalog()
+        
+        return {
+            "created": len(accepted),
+            "failed": len(results) - len(accepted),
+            "results": results
+        }
+    
+    @staticmethod
+    def bloquear_pedidos(db: Session, pedido_ids) -> dict:
+        """Carga y bloquea los pedidos en una consulta, en orden de id"""
+        pedidos = db.query(Pedido)\
+            .filter(Pedido.id.in_(sorted(set(pedido_ids))))\
+            .order_by(Pedido.id)\
+            .with_for_update()\
+            .all()
+        return {pedido.id: pedido for pedido in pedidos}
+    
+    @staticmethod
+    def revertir_pedidos(db: Session, items: list, usuario_id: int) -> List[Devolucion]:
+        """
+        Revierte pedidos ya validados, dados como (pedido, DevolucionCreate), con una
+        sentencia por tabla sin importar cuántos sean (sin commit)
+        """
+        pedido_ids = [pedido.id for pedido, _ in items]
+        now = datetime.utcnow()
+        
+        # 1. Eliminar las líneas de todos los pedidos (quedan en productos_devueltos) y
+        #    bloquear sus productos en orden de id
+        detalles = sorted(db.execute(
+            delete(DetallePedido)
+            .where(DetallePedido.pedido_id.in_(pedido_ids))
+            .returning(
+                DetallePedido.id, DetallePedido.pedido_id, DetallePedido.producto_id,
+                DetallePedido.cantidad, DetallePedido.precio_unitario
+            )
+            .execution_options(synchronize_session=False)
+        ).all(), key=lambda detalle: detalle.id)
+        
+        cantidades = {}
+        for detalle in detalles:
+            cantidades[detalle.producto_id] = cantidades.get(detalle.producto_id, 0) + detalle.cantidad
+        productos = OrderService.lock_products(db, cantidades.keys())
+        
+        productos_devueltos = {pedido_id: [] for pedido_id in pedido_ids}
+        for detalle in detalles:
+            producto = productos.get(detalle.producto_id)
+            productos_devueltos[detalle.pedido_id].append({
+                "producto_id": detalle.producto_id,
+                "nombre": producto.nombre if producto else "Producto no encontrado",
+                "cantidad": detalle.cantidad,
+                "precio": float(detalle.precio_unitario)
+            })
+        
+        # 2. Restaurar inventario
+        DevolucionService.reponer_stock(db, {
+            producto_id: cantidad for producto_id, cantidad in cantidades.items() if producto_id in productos
+        })
+        
+        # 3. Eliminar pagos asociados (reversar transacciones)
+        pagos = db.execute(
+            delete(Pago)
+            .where(Pago.pedido_id.in_(pedido_ids))
+            .returning(Pago.fecha_pago, Pago.monto)
+            .execution_options(synchronize_session=False)
+        ).all()
+        
+        # Actualizar resumen diario (pagos revertidos y pedidos devueltos)
+        pagos_por_dia = {}
+        for fecha_pago, monto in pagos:
+            pagos_por_dia.setdefault(fecha_pago.date(), []).append(monto)
+        # Días en orden, para bloquear las filas del resumen en el mismo orden que otras transacciones
+        for dia in sorted(pagos_por_dia):
+            RollupService.record_payments(db, dia, pagos_por_dia[dia], sign=-1)
+        RollupService.record_status_changes(db, [
+            (pedido.fecha_pedido.date(), pedido.total, pedido.estado, "devuelto") for pedido, _ in items
+        ])
+        
+        # 4. Cambiar estado de los pedidos a 'devuelto'
+        db.execute(
+            update(Pedido)
+            .where(Pedido.id.in_(pedido_ids))
+            .values(estado="devuelto", total_pagado=0, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # 5. Crear registros de devolución
+        devoluciones = [
+            Devolucion(
+                pedido_id=pedido.id,
+                usuario_id=usuario_id,
+                motivo=devolucion_data.motivo,
+                descripcion=devolucion_data.descripcion,
+                productos_devueltos=productos_devueltos[pedido.id],
+                monto_total=float(pedido.total),
+                fecha_devolucion=now
+            )
+            for pedido, devolucion_data in items
+        ]
+        db.add_all(devoluciones)
+        db.flush()
+        return devoluciones
+    
+    @staticmethod
+    def reponer_stock(db: Session, cantidades: dict):
+        """Suma al stock de muchos productos con un solo UPDATE ... FROM (VALUES ...)"""
+        if not cantidades:
+            return
+        devuelto = values(
+            column("producto_id", Integer), column("cantidad", Integer), name="devuelto"
+        ).data(sorted(cantidades.items()))
+        db.execute(
+            update(Producto)
+            .where(Producto.id == devuelto.c.producto_id)
+            .values(stock=Producto.stock + devuelto.c.cantidad, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    
     @staticmethod
     def obtener_devolucion_por_pedido(db: Session, pedido_id: int):
         """Obtiene la devolución asociada a un pedido"""
@@ -101,8 +239,10 @@ class DevolucionService:
         return devolucion
     
     @staticmethod
-    def listar_devoluciones(db: Session, skip: int = 0, limit: int = 100):
+    def listar_devoluciones(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
         """Lista todas las devoluciones"""
+        if cursor is not None:
+            return BaseService.keyset(db.query(Devolucion), Devolucion, limit, cursor).all()
         return db.query(Devolucion).order_by(
             Devolucion.fecha_devolucion.desc()
         ).offset(skip).limit(limit).all()
@@ -1,6 +1,8 @@
 """Export service for generating PDF and Excel reports"""
 from io import BytesIO
 from datetime import date
+from typing import Iterator, Optional
+from sqlalchemy import select
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -9,6 +11,22 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from src.core.database import SessionLocal
+from src.core.streaming import date_range_filters, stream_rows
+from src.modules.orders.model import Pedido, DetallePedido
+from src.modules.products.model import Producto
+from src.modules.clients.model import Cliente
+from src.modules.payments.model import Pago
+import tempfile
+
+# Bytes per chunk when streaming a finished file to the client
+FILE_CHUNK_BYTES = 64 * 1024
+
+HISTORY_LINE_HEADERS = [
+    "Pedido", "Fecha", "Cliente", "Estado", "Total Pedido", "Total Pagado",
+    "Producto ID", "Producto", "Cantidad", "Precio Unitario", "Subtotal"
+]
+HISTORY_PAYMENT_HEADERS = ["Pago", "Pedido", "Fecha Pago", "Monto", "Cuenta Origen", "Código Transfermóvil"]
 
 
 class ExportService:
@@ -298,3 +316,67 @@ class ExportService:
         wb.save(buffer)
         buffer.seek(0)
         return buffer
+    
+    @staticmethod
+    def order_lines_query(desde: Optional[date] = None, hasta: Optional[date] = None):
+        """One row per order line, with its order, client and product"""
+        return select(
+            Pedido.id, Pedido.fecha_pedido, Cliente.nombre, Pedido.estado, Pedido.total, Pedido.total_pagado,
+            DetallePedido.producto_id, Producto.nombre, DetallePedido.cantidad,
+            DetallePedido.precio_unitario, DetallePedido.subtotal
+        ).select_from(Pedido)\
+            .join(Cliente, Cliente.id == Pedido.cliente_id)\
+            .join(DetallePedido, DetallePedido.pedido_id == Pedido.id)\
+            .outerjoin(Producto, Producto.id == DetallePedido.producto_id)\
+            .where(*date_range_filters(Pedido.fecha_pedido, desde, hasta))\
+            .order_by(Pedido.id, DetallePedido.id)
+    
+    @staticmethod
+    def order_payments_query(desde: Optional[date] = None, hasta: Optional[date] = None):
+        """Payments of the orders placed in the range"""
+        return select(
+            Pago.id, Pago.pedido_id, Pago.fecha_pago, Pago.monto, Pago.cuenta_origen, Pago.codigo_transfermovil
+        ).join(Pedido, Pedido.id == Pago.pedido_id)\
+            .where(*date_range_filters(Pedido.fecha_pedido, desde, hasta))\
+            .order_by(Pago.pedido_id, Pago.id)
+    
+    @staticmethod
+    def stream_order_history_excel(desde: Optional[date] = None, hasta: Optional[date] = None) -> Iterator[bytes]:
+        """
+        Full order history (lines and payments) as XLSX.
+        Rows go straight from the cursor into a write-only workbook backed by a
+        temporary file, which is then streamed in chunks.
+        """
+        db = SessionLocal()
+        try:
+            with tempfile.TemporaryFile(suffix=".xlsx") as tmp:
+                wb = Workbook(write_only=True)
+                
+                ws_lines = wb.create_sheet("Pedidos")
+                ws_lines.append(HISTORY_LINE_HEADERS)
+                for rows in stream_rows(db, ExportService.order_lines_query(desde, hasta)):
+                    for row in rows:
+                        ws_lines.append(list(row))
+                
+                ws_payments = wb.create_sheet("Pagos")
+                ws_payments.append(HISTORY_PAYMENT_HEADERS)
+                for rows in stream_rows(db, ExportService.order_payments_query(desde, hasta)):
+                    for row in rows:
+                        ws_payments.append(list(row))
+                
+                wb.save(tmp)
+                # Release the connection before the (possibly slow) download
+                db.close()
+                
+                tmp.seek(0)
+                while chunk := tmp.read(FILE_CHUNK_BYTES):
+                    yield chunk
+        finally:
+            db.close()
+
+
+def render_summary(formato: str, stats: dict, low_stock: list, pending_summary: dict) -> bytes:
+    """Render a summary document to bytes (runs in the report process pool)"""
+    if formato == "pdf":
+        return ExportService.generate_summary_pdf(stats, low_stock, pending_summary).getvalue()
+    return ExportService.generate_summary_excel(stats, low_stock, pending_summary).getvalue()
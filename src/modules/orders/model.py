@@ -1,5 +1,5 @@
 """Order models"""
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.core.database import Base
@@ -10,7 +10,7 @@ class Pedido(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False)
-    fecha_pedido = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fecha_pedido = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     estado = Column(String(9), nullable=False, default="pendiente")  # pendiente, pagado
     total = Column(Numeric, nullable=False)
     total_pagado = Column(Numeric, nullable=False, default=0)
@@ -24,6 +24,10 @@ class Pedido(Base):
     pagos = relationship("Pago", back_populates="pedido", cascade="all, delete-orphan")
 
 
+# Newest-first keyset pagination (migration 0006)
+Index("ix_pedidos_created_id", Pedido.created_at.desc(), Pedido.id.desc())
+
+
 class DetallePedido(Base):
     __tablename__ = "detalles_pedido"
     
@@ -38,3 +42,20 @@ class DetallePedido(Base):
     # Relationships
     pedido = relationship("Pedido", back_populates="detalles")
     producto = relationship("Producto")
+
+
+class VentaDiaria(Base):
+    """Daily sales rollup, kept up to date in the same transaction as orders and payments"""
+    __tablename__ = "ventas_diarias"
+    
+    fecha = Column(Date, primary_key=True)
+    total_pedidos = Column(Integer, nullable=False, default=0)
+    total_ventas = Column(Numeric, nullable=False, default=0)
+    total_cobrado = Column(Numeric, nullable=False, default=0)
+    cantidad_pagos = Column(Integer, nullable=False, default=0)
+    pedidos_pagados = Column(Integer, nullable=False, default=0)
+    pedidos_pendientes = Column(Integer, nullable=False, default=0)
+    monto_pendiente = Column(Numeric, nullable=False, default=0)  # total of pending orders placed that day
+    devoluciones = Column(Integer, nullable=False, default=0)
+    monto_devuelto = Column(Numeric, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
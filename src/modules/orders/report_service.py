@@ -0,0 +1,90 @@
+"""Summary report generation off the request workers, with a rendered-file cache"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.cache import TTLCache
+from src.config.settings import get_settings
+from src.modules.orders.stats_service import StatsService
+from src.modules.orders.export_service import render_summary
+import asyncio
+import hashlib
+import json
+import multiprocessing
+
+settings = get_settings()
+
+MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Rendered files keyed by (formato, date, data hash); a changed summary gets a new key
+report_cache = TTLCache(max_size=settings.REPORT_CACHE_MAX_SIZE, ttl=settings.REPORT_CACHE_TTL_SECONDS)
+
+
+class ReportService:
+    """Renders PDF/Excel summaries in a process pool so ReportLab/openpyxl don't hold request workers"""
+    
+    _pool = None
+    _inflight = {}
+    
+    @staticmethod
+    def pool() -> ProcessPoolExecutor:
+        # Spawned (not forked) workers: the API process runs threads and an event loop
+        if ReportService._pool is None:
+            ReportService._pool = ProcessPoolExecutor(
+                max_workers=settings.REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return ReportService._pool
+    
+    @staticmethod
+    def shutdown():
+        if ReportService._pool is not None:
+            ReportService._pool.shutdown(wait=False, cancel_futures=True)
+            ReportService._pool = None
+    
+    @staticmethod
+    async def get_summary_data(db: AsyncSession, target_date: date) -> tuple:
+        """Same inputs the summary exports always used: daily sales, low stock, pending orders"""
+        stats = await StatsService.get_daily_sales_async(db, target_date)
+        low_stock = await StatsService.get_low_stock_products_async(db)
+        pending_summary = await StatsService.get_pending_orders_summary_async(db)
+        return stats, low_stock, pending_summary
+    
+    @staticmethod
+    def data_version(*data) -> str:
+        """Hash of the report inputs: equal data renders to the same cached file"""
+        raw = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+    
+    @staticmethod
+    async def render_summary(db: AsyncSession, formato: str, target_date: date = None) -> bytes:
+        """Rendered summary for a date, from cache or from the process pool"""
+        if target_date is None:
+            target_date = date.today()
+        
+        data = await ReportService.get_summary_data(db, target_date)
+        key = (formato, target_date, ReportService.data_version(*data))
+        
+        content = report_cache.get(key)
+        if content is not None:
+            return content
+        
+        # Concurrent requests for the same report share one render
+        task = ReportService._inflight.get(key)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = loop.run_in_executor(ReportService.pool(), render_summary, formato, *data)
+            ReportService._inflight[key] = task
+            task.add_done_callback(lambda done: ReportService._render_done(key, done))
+        
+        # A client that disconnects must not cancel the render the others are waiting on
+        return await asyncio.shield(task)
+    
+    @staticmethod
+    def _render_done(key, task):
+        """Cache a finished render and let the next request for the key start a new one"""
+        ReportService._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            report_cache.set(key, task.result())
@@ -0,0 +1,165 @@
+"""Daily sales rollup maintenance"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, cast, Date, text
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+from src.modules.orders.model import Pedido, VentaDiaria
+from src.modules.payments.model import Pago
+
+# Rollup columns that count orders in each state, and their amount column
+ESTADO_COLUMNS = {
+    "pendiente": ("pedidos_pendientes", "monto_pendiente"),
+    "pagado": ("pedidos_pagados", None),
+    "devuelto": ("devoluciones", "monto_devuelto"),
+}
+
+
+class RollupService:
+    """Incremental updates and rebuilds of ventas_diarias"""
+    
+    @staticmethod
+    def bump(db: Session, fecha: date, **deltas):
+        """Add deltas to the row of a day, creating it if needed (no commit)"""
+        deltas = {column: value for column, value in deltas.items() if value}
+        if not deltas:
+            return
+        now = datetime.utcnow()
+        stmt = insert(VentaDiaria).values(fecha=fecha, updated_at=now, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VentaDiaria.fecha],
+            set_={
+                **{column: getattr(VentaDiaria, column) + stmt.excluded[column] for column in deltas},
+                "updated_at": now
+            }
+        )
+        db.execute(stmt)
+    
+    @staticmethod
+    def _estado_deltas(estado: str, total, sign: int) -> dict:
+        """Deltas that add (sign=1) or remove (sign=-1) an order from its state bucket"""
+        count_column, amount_column = ESTADO_COLUMNS.get(estado, (None, None))
+        deltas = {}
+        if count_column:
+            deltas[count_column] = sign
+        if amount_column:
+            deltas[amount_column] = sign * Decimal(str(total))
+        return deltas
+    
+    @staticmethod
+    def record_orders(db: Session, fecha: date, orders: list):
+        """Count new orders placed on a day, given as (total, estado) pairs"""
+        deltas = {"total_pedidos": len(orders), "total_ventas": Decimal(0)}
+        for total, estado in orders:
+            deltas["total_ventas"] += Decimal(str(total))
+            for column, value in RollupService._estado_deltas(estado, total, 1).items():
+                deltas[column] = deltas.get(column, 0) + value
+        RollupService.bump(db, fecha, **deltas)
+    
+    @staticmethod
+    def record_payments(db: Session, fecha: date, montos: list, sign: int = 1):
+        """Count payments made on a day (sign=-1 to reverse them)"""
+        RollupService.bump(
+            db, fecha,
+            cantidad_pagos=sign * len(montos),
+            total_cobrado=sign * sum((Decimal(str(monto)) for monto in montos), Decimal(0))
+        )
+    
+    @staticmethod
+    def record_status_change(db: Session, fecha: date, total, estado_anterior: str, estado_nuevo: str):
+        """Move an order placed on a day from one state bucket to another"""
+        if estado_anterior == estado_nuevo:
+            return
+        deltas = RollupService._estado_deltas(estado_anterior, total, -1)
+        for column, value in RollupService._estado_deltas(estado_nuevo, total, 1).items():
+            deltas[column] = deltas.get(column, 0) + value
+        RollupService.bump(db, fecha, **deltas)
+    
+    @staticmethod
+    def record_status_changes(db: Session, changes: list):
+        """Many status changes at once, given as (fecha, total, estado_anterior, estado_nuevo); one upsert per day"""
+        por_dia = {}
+        for fecha, total, estado_anterior, estado_nuevo in changes:
+            if estado_anterior == estado_nuevo:
+                continue
+            deltas = por_dia.setdefault(fecha, {})
+            for estado, sign in ((estado_anterior, -1), (estado_nuevo, 1)):
+                for column, value in RollupService._estado_deltas(estado, total, sign).items():
+                    deltas[column] = deltas.get(column, 0) + value
+        # Days in order so concurrent transactions lock the rollup rows in the same order
+        for fecha in sorted(por_dia):
+            RollupService.bump(db, fecha, **por_dia[fecha])
+    
+    @staticmethod
+    def rebuild(db: Session, desde: date, hasta: date) -> int:
+        """Recompute the rollup for every day in [desde, hasta] from pedidos and pagos (no commit)"""
+        # Block concurrent bumps until the rebuilt rows commit; reads are not blocked.
+        # Taken before aggregating so writers already in flight are counted once, by the rebuild
+        db.execute(text("LOCK TABLE ventas_diarias IN EXCLUSIVE MODE"))
+        
+        start = datetime.combine(desde, time.min)
+        end = datetime.combine(hasta + timedelta(days=1), time.min)
+        
+        dia_pedido = cast(Pedido.fecha_pedido, Date)
+        pedidos = db.query(
+            dia_pedido,
+            func.count(Pedido.id),
+            func.coalesce(func.sum(Pedido.total), 0),
+            func.count(Pedido.id).filter(Pedido.estado == "pagado"),
+            func.count(Pedido.id).filter(Pedido.estado == "pendiente"),
+            func.coalesce(func.sum(Pedido.total).filter(Pedido.estado == "pendiente"), 0),
+            func.count(Pedido.id).filter(Pedido.estado == "devuelto"),
+            func.coalesce(func.sum(Pedido.total).filter(Pedido.estado == "devuelto"), 0)
+        ).filter(
+            Pedido.fecha_pedido >= start,
+            Pedido.fecha_pedido < end
+        ).group_by(dia_pedido).all()
+        
+        dia_pago = cast(Pago.fecha_pago, Date)
+        pagos = db.query(
+            dia_pago,
+            func.count(Pago.id),
+            func.coalesce(func.sum(Pago.monto), 0)
+        ).filter(
+            Pago.fecha_pago >= start,
+            Pago.fecha_pago < end
+        ).group_by(dia_pago).all()
+        
+        now = datetime.utcnow()
+        rows = {}
+        for dia, total, ventas, pagados, pendientes, monto_pendiente, devueltos, monto_devuelto in pedidos:
+            rows[dia] = {
+                "fecha": dia,
+                "total_pedidos": total,
+                "total_ventas": ventas,
+                "pedidos_pagados": pagados,
+                "pedidos_pendientes": pendientes,
+                "monto_pendiente": monto_pendiente,
+                "devoluciones": devueltos,
+                "monto_devuelto": monto_devuelto,
+                "total_cobrado": 0,
+                "cantidad_pagos": 0,
+                "updated_at": now
+            }
+        for dia, cantidad, cobrado in pagos:
+            row = rows.setdefault(dia, {
+                "fecha": dia,
+                "total_pedidos": 0,
+                "total_ventas": 0,
+                "pedidos_pagados": 0,
+                "pedidos_pendientes": 0,
+                "monto_pendiente": 0,
+                "devoluciones": 0,
+                "monto_devuelto": 0,
+                "updated_at": now
+            })
+            row["cantidad_pagos"] = cantidad
+            row["total_cobrado"] = cobrado
+        
+        db.query(VentaDiaria).filter(
+            VentaDiaria.fecha >= desde,
+            VentaDiaria.fecha <= hasta
+        ).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(VentaDiaria), list(rows.values()))
+        return len(rows)
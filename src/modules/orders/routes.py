@@ -1,28 +1,62 @@
 """Order API routes"""
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import date
-from src.core.database import get_db
-from src.core.deps import require_role
-from src.modules.orders.schema import OrderCreate, OrderUpdate, OrderResponse
+from src.core.database import get_db, get_async_db
+from src.core.deps import require_role, require_role_async
+from src.core.base_service import BaseService
+from src.core.streaming import stream_ndjson, stream_csv, NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE
+from src.modules.orders.schema import (
+    OrderCreate, OrderUpdate, OrderResponse, OrderBulkCreate, OrderBulkResponse
+)
 from src.modules.orders.service import OrderService
 from src.modules.orders.stats_service import StatsService
-# from src.modules.orders.export_service import ExportService  # Temporalmente deshabilitado
+from src.modules.orders.report_service import ReportService, MEDIA_TYPES
+from src.modules.orders.export_service import ExportService
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
 
 @router.get("/", response_model=List[OrderResponse])
-def list_orders(
+async def list_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin", "supervisor", "vendedor"]))
 ):
-    """List all orders"""
-    return OrderService.list_orders(db, skip, limit)
+    """List all orders - pass `cursor` (empty for the first page) for keyset pagination"""
+    orders = await OrderService.list_orders_async(db, skip, limit, cursor)
+    BaseService.set_next_cursor(response, orders, limit, cursor)
+    return orders
+
+
+@router.get("/export.ndjson")
+def export_orders_ndjson(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user = Depends(require_role(["admin", "supervisor"]))
+):
+    """Stream orders placed in the date range as NDJSON (one order per line)"""
+    return StreamingResponse(stream_ndjson(OrderService.export_query(desde, hasta)), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/export.csv")
+def export_orders_csv(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user = Depends(require_role(["admin", "supervisor"]))
+):
+    """Stream orders placed in the date range as CSV"""
+    return StreamingResponse(
+        stream_csv(OrderService.export_query(desde, hasta)),
+        media_type=CSV_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename=pedidos_{desde or 'inicio'}_{hasta or date.today()}.csv"}
+    )
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
@@ -45,6 +79,16 @@ def create_order(
     return OrderService.create_order(db, order_data)
 
 
+@router.post("/bulk", response_model=OrderBulkResponse)
+def create_orders_bulk(
+    bulk_data: OrderBulkCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
+):
+    """Create many orders in one transaction - returns the result of each order"""
+    return OrderService.create_orders_bulk(db, bulk_data.orders)
+
+
 @router.patch("/{order_id}", response_model=OrderResponse)
 def update_order(
     order_id: int,
@@ -57,76 +101,78 @@ def update_order(
 
 
 @router.get("/stats/daily", response_model=dict)
-def get_daily_stats(
+async def get_daily_stats(
     target_date: date = None,
-    db: Session = Depends(get_db),
-    current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin", "supervisor", "vendedor"]))
 ):
     """Get daily sales statistics"""
-    return StatsService.get_daily_sales(db, target_date)
+    return await StatsService.get_daily_sales_async(db, target_date)
 
 
 @router.get("/stats/pending-summary", response_model=dict)
-def get_pending_summary(
-    db: Session = Depends(get_db),
-    current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
+async def get_pending_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin", "supervisor", "vendedor"]))
 ):
     """Get summary of pending orders"""
-    return StatsService.get_pending_orders_summary(db)
+    return await StatsService.get_pending_orders_summary_async(db)
 
 
 @router.get("/stats/monthly", response_model=dict)
-def get_monthly_stats(
-    year: int = None,
-    month: int = None,
-    db: Session = Depends(get_db),
-    current_user = Depends(require_role(["admin", "supervisor"]))
+async def get_monthly_stats(
+    year: Optional[int] = Query(None, ge=2000, le=2100),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin", "supervisor"]))
 ):
     """Get monthly sales statistics"""
-    return StatsService.get_monthly_sales(db, year, month)
-
-
-# Temporalmente deshabilitado - requiere reportlab
-# @router.get("/export/summary-pdf")
-# def export_summary_pdf(
-#     db: Session = Depends(get_db),
-#     current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
-# ):
-#     """Export summary report to PDF"""
-#     # Get all data
-#     stats = StatsService.get_daily_sales(db)
-#     low_stock = StatsService.get_low_stock_products(db)
-#     pending_summary = StatsService.get_pending_orders_summary(db)
-#     
-#     # Generate PDF
-#     pdf_buffer = ExportService.generate_summary_pdf(stats, low_stock, pending_summary)
-#     
-#     # Return as downloadable file
-#     return StreamingResponse(
-#         pdf_buffer,
-#         media_type="application/pdf",
-#         headers={"Content-Disposition": f"attachment; filename=resumen_{date.today().isoformat()}.pdf"}
-#     )
-
-
-# Temporalmente deshabilitado - requiere reportlab
-# @router.get("/export/summary-excel")
-# def export_summary_excel(
-#     db: Session = Depends(get_db),
-#     current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
-# ):
-#     """Export summary report to Excel"""
-#     # Get all data
-#     stats = StatsService.get_daily_sales(db)
-#     low_stock = StatsService.get_low_stock_products(db)
-#     pending_summary = StatsService.get_pending_orders_summary(db)
-#     
-#     # Generate Excel
-#     excel_buffer = ExportService.generate_summary_excel(stats, low_stock, pending_summary)
-#     
-#     # Return as downloadable file
-#     return StreamingResponse(
-#         excel_buffer,
-#         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-#         headers={"Content-Disposition": f"attachment; filename=resumen_{date.today().isoformat()}.xlsx"}
-#     )
+    return await StatsService.get_monthly_sales_async(db, year, month)
+
+
+@router.get("/export/summary-pdf")
+async def export_summary_pdf(
+    target_date: date = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin", "supervisor", "vendedor"]))
+):
+    """Export summary report to PDF"""
+    return await _summary_download(db, "pdf", target_date)
+
+
+@router.get("/export/summary-excel")
+async def export_summary_excel(
+    target_date: date = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin", "supervisor", "vendedor"]))
+):
+    """Export summary report to Excel"""
+    return await _summary_download(db, "xlsx", target_date)
+
+
+@router.get("/export/history-excel")
+def export_history_excel(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user = Depends(require_role(["admin", "supervisor"]))
+):
+    """Export every order line and payment in the date range to Excel (streamed)"""
+    filename = f"historial_pedidos_{desde or 'inicio'}_{hasta or date.today()}.xlsx"
+    return StreamingResponse(
+        ExportService.stream_order_history_excel(desde, hasta),
+        media_type=MEDIA_TYPES["xlsx"],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+async def _summary_download(db: AsyncSession, formato: str, target_date: Optional[date]) -> Response:
+    # Rendered in the report process pool, or served from the report cache
+    target_date = target_date or date.today()
+    content = await ReportService.render_summary(db, formato, target_date)
+    
+    # Return as downloadable file
+    return Response(
+        content=content,
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f"attachment; filename=resumen_{target_date.isoformat()}.{formato}"}
+    )
@@ -42,6 +42,22 @@ class OrderCreate(OrderBase):
     pago: Optional[PagoInmediato] = None
 
 
+class OrderBulkCreate(BaseModel):
+    orders: List[OrderCreate] = Field(..., min_length=1, max_length=1000)
+
+
+class OrderBulkResult(BaseModel):
+    index: int
+    order_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class OrderBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[OrderBulkResult]
+
+
 class OrderUpdate(BaseModel):
     devolucion_sacar_negocio: Optional[bool] = None
 
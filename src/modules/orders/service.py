@@ -1,51 +1,124 @@
 """Order business logic"""
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, update, case, select
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 from src.modules.orders.model import Pedido, DetallePedido
 from src.modules.orders.schema import OrderCreate, OrderUpdate
 from src.modules.products.model import Producto
+from src.modules.products.service import ProductService
 from src.modules.clients.model import Cliente
-from src.modules.payments.model import Pago
-from datetime import datetime
+from src.modules.payments.model import Pago, is_duplicate_code
+from src.core.base_service import BaseService
+from src.core.streaming import date_range_filters
+from src.modules.orders.rollup_service import RollupService
+from datetime import date, datetime
 from decimal import Decimal
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class OrderService:
+
+    @staticmethod
+    def load_options(include_productos: bool = False, include_pagos: bool = False) -> list:
+        """Loading strategy for orders: details always, products and payments on demand"""
+        detalles = selectinload(Pedido.detalles)
+        options = [detalles.joinedload(DetallePedido.producto) if include_productos else detalles]
+        if include_pagos:
+            options.append(selectinload(Pedido.pagos))
+        return options
     
     @staticmethod
-    def get_by_id(db: Session, order_id: int) -> Pedido:
+    def get_by_id(
+        db: Session,
+        order_id: int,
+        include_productos: bool = False,
+        include_pagos: bool = False
+    ) -> Pedido:
         """Get order by ID"""
-        order = db.query(Pedido).filter(Pedido.id == order_id).first()
+        order = db.query(Pedido)\
+            .options(*OrderService.load_options(include_productos, include_pagos))\
+            .filter(Pedido.id == order_id)\
+            .first()
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         return order
     
     @staticmethod
-    def list_orders(db: Session, skip: int = 0, limit: int = 100):
-        """List all orders"""
-        return db.query(Pedido).order_by(Pedido.created_at.desc()).offset(skip).limit(limit).all()
+    def list_orders(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_productos: bool = False,
+        include_pagos: bool = False
+    ):
+        """List all orders, newest first"""
+        query = db.query(Pedido).options(*OrderService.load_options(include_productos, include_pagos))
+        if cursor is not None:
+            return BaseService.keyset(query, Pedido, limit, cursor).all()
+        return query.order_by(Pedido.created_at.desc()).offset(skip).limit(limit).all()
     
     @staticmethod
-    def create_order(db: Session, order_data: OrderCreate) -> Pedido:
-        """Create new order with details"""
-        # Verify client exists
-        client = db.query(Cliente).filter(Cliente.id == order_data.cliente_id).first()
-        if not client:
-            raise HTTPException(status_code=404, detail="Client not found")
-        
-        # Calculate total and verify stock
+    async def list_orders_async(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_productos: bool = False,
+        include_pagos: bool = False
+    ):
+        """List all orders, newest first (async session)"""
+        query = select(Pedido).options(*OrderService.load_options(include_productos, include_pagos))
+        if cursor is not None:
+            query = BaseService.keyset(query, Pedido, limit, cursor)
+        else:
+            query = query.order_by(Pedido.created_at.desc()).offset(skip).limit(limit)
+        result = await db.scalars(query)
+        return result.all()
+    
+    @staticmethod
+    def export_query(desde: Optional[date] = None, hasta: Optional[date] = None):
+        """Order rows placed in the date range, as plain columns for streaming exports"""
+        return select(*Pedido.__table__.columns)\
+            .where(*date_range_filters(Pedido.fecha_pedido, desde, hasta))\
+            .order_by(Pedido.id)
+    
+    @staticmethod
+    def lock_products(db: Session, product_ids) -> dict:
+        """Load and lock products in one query, always in id order to avoid deadlocks"""
+        productos = db.query(Producto)\
+            .filter(Producto.id.in_(sorted(set(product_ids))))\
+            .order_by(Producto.id)\
+            .with_for_update()\
+            .all()
+        return {producto.id: producto for producto in productos}
+    
+    @staticmethod
+    def build_order_lines(order_data: OrderCreate, productos: dict, disponible: dict):
+        """
+        Validate stock and price every line of an order.
+        `disponible` maps producto_id -> stock left and is decremented on success.
+        """
         total = Decimal(0)
-        detalles_to_create = []
+        lines = []
+        requested = {}
         
         for detalle in order_data.detalles:
-            producto = db.query(Producto).filter(Producto.id == detalle.producto_id).first()
+            producto = productos.get(detalle.producto_id)
             if not producto:
                 raise HTTPException(status_code=404, detail=f"Product {detalle.producto_id} not found")
             
-            if producto.stock < detalle.cantidad:
+            # Repeated lines of the same product share the same stock
+            requested[producto.id] = requested.get(producto.id, 0) + detalle.cantidad
+            if disponible[producto.id] < requested[producto.id]:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"Insufficient stock for product '{producto.nombre}'. Available: {producto.stock}"
+                    detail=f"Insufficient stock for product '{producto.nombre}'. Available: {disponible[producto.id]}"
                 )
             
             # Use provided price or product price
@@ -53,14 +126,51 @@ class OrderService:
             subtotal = precio * detalle.cantidad
             total += subtotal
             
-            detalles_to_create.append({
+            lines.append({
                 "producto_id": detalle.producto_id,
                 "cantidad": detalle.cantidad,
                 "precio_unitario": precio,
-                "subtotal": subtotal,
-                "producto": producto
+                "subtotal": subtotal
             })
         
+        for producto_id, cantidad in requested.items():
+            disponible[producto_id] -= cantidad
+        
+        return total, lines
+    
+    @staticmethod
+    def decrement_stock(db: Session, cantidades: dict):
+        """Decrease stock of many products with a single UPDATE"""
+        if not cantidades:
+            return
+        db.execute(
+            update(Producto)
+            .where(Producto.id.in_(cantidades.keys()))
+            .values(
+                stock=Producto.stock - case(cantidades, value=Producto.id),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def create_order(db: Session, order_data: OrderCreate) -> Pedido:
+        """Create new order with details"""
+        # Verify client exists
+        client = db.query(Cliente).filter(Cliente.id == order_data.cliente_id).first()
+        if not client:
+            raise HTTPException(status_code=404, detail="Client not found")
+        
+        # Lock every product of the order at once so concurrent orders cannot oversell
+        productos = OrderService.lock_products(db, [d.producto_id for d in order_data.detalles])
+        disponible = {producto.id: producto.stock for producto in productos.values()}
+        
+        try:
+            total, lines = OrderService.build_order_lines(order_data, productos, disponible)
+        except HTTPException:
+            db.rollback()
+            raise
+        
         # Create order
         estado_inicial = "pagado" if order_data.pago_inmediato else "pendiente"
         total_pagado_inicial = total if order_data.pago_inmediato else Decimal(0)
@@ -74,17 +184,14 @@ class OrderService:
         db.add(db_order)
         db.flush()
         
-        # Create order details and update stock
-        for detalle_data in detalles_to_create:
-            producto = detalle_data.pop("producto")
-            db_detalle = DetallePedido(
-                pedido_id=db_order.id,
-                **detalle_data
-            )
-            db.add(db_detalle)
-            
-            # Update product stock
-            producto.stock -= detalle_data["cantidad"]
+        # Create order details in one multi-row insert
+        db.execute(insert(DetallePedido), [{"pedido_id": db_order.id, **line} for line in lines])
+        
+        # Update product stock
+        OrderService.decrement_stock(db, {
+            producto_id: productos[producto_id].stock - restante
+            for producto_id, restante in disponible.items()
+        })
         
         # Create payment if pago_inmediato
         if order_data.pago_inmediato and order_data.pago:
@@ -96,11 +203,145 @@ class OrderService:
                 fecha_pago=datetime.utcnow()
             )
             db.add(db_pago)
+            try:
+                db.flush()
+            except IntegrityError as e:
+                db.rollback()
+                if is_duplicate_code(e):
+                    raise HTTPException(status_code=400, detail="Transfermóvil code already registered")
+                raise
+            RollupService.record_payments(db, db_pago.fecha_pago.date(), [db_pago.monto])
+        
+        RollupService.record_orders(db, db_order.fecha_pedido.date(), [(total, estado_inicial)])
         
         db.commit()
+        ProductService.invalidate_catalog()
         db.refresh(db_order)
         return db_order
     
+    @staticmethod
+    def create_orders_bulk(db: Session, orders: List[OrderCreate]) -> dict:
+        """
+        Create many orders in a single transaction.
+        Every order is validated against one locked product/client snapshot
+        with the same rules as create_order; invalid orders are reported, not inserted.
+        """
+        client_ids = {order_data.cliente_id for order_data in orders}
+        existing_clients = {
+            client_id for (client_id,) in db.query(Cliente.id).filter(Cliente.id.in_(client_ids))
+        }
+        productos = OrderService.lock_products(
+            db, [d.producto_id for order_data in orders for d in order_data.detalles]
+        )
+        disponible = {producto.id: producto.stock for producto in productos.values()}
+        codigos = {
+            order_data.pago.codigo_transfermovil for order_data in orders
+            if order_data.pago_inmediato and order_data.pago and order_data.pago.codigo_transfermovil
+        }
+        registrados = set(db.scalars(
+            select(Pago.codigo_transfermovil).where(Pago.codigo_transfermovil.in_(codigos))
+        )) if codigos else set()
+        
+        results = []
+        accepted = []
+        for index, order_data in enumerate(orders):
+            result = {"index": index, "order_id": None, "error": None}
+            results.append(result)
+            
+            if order_data.cliente_id not in existing_clients:
+                result["error"] = "Client not found"
+                continue
+            
+            codigo = order_data.pago.codigo_transfermovil if order_data.pago_inmediato and order_data.pago else None
+            if codigo in registrados:
+                result["error"] = "Transfermóvil code already registered"
+                continue
+            
+            try:
+                total, lines = OrderService.build_order_lines(order_data, productos, disponible)
+            except HTTPException as e:
+                result["error"] = e.detail
+                continue
+            
+            if codigo:
+                registrados.add(codigo)
+            accepted.append((result, order_data, total, lines))
+        
+        if not accepted:
+            db.rollback()
+            return {"created": 0, "failed": len(results), "results": results}
+        
+        try:
+            now = datetime.utcnow()
+            order_ids = db.scalars(
+                insert(Pedido).returning(Pedido.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "cliente_id": order_data.cliente_id,
+                        "fecha_pedido": now,
+                        "estado": "pagado" if order_data.pago_inmediato else "pendiente",
+                        "total": total,
+                        "total_pagado": total if order_data.pago_inmediato else Decimal(0),
+                        "created_at": now,
+                        "updated_at": now
+                    }
+                    for _, order_data, total, _ in accepted
+                ]
+            ).all()
+            
+            detalles = []
+            pagos = []
+            for order_id, (result, order_data, _, lines) in zip(order_ids, accepted):
+                result["order_id"] = order_id
+                detalles.extend({"pedido_id": order_id, "created_at": now, **line} for line in lines)
+                
+                if order_data.pago_inmediato and order_data.pago:
+                    pagos.append({
+                        "pedido_id": order_id,
+                        "monto": order_data.pago.monto,
+                        "cuenta_origen": order_data.pago.cuenta_origen,
+                        "codigo_transfermovil": order_data.pago.codigo_transfermovil,
+                        "fecha_pago": now,
+                        "created_at": now
+                    })
+            
+            db.execute(insert(DetallePedido), detalles)
+            if pagos:
+                db.execute(insert(Pago), pagos)
+            
+            OrderService.decrement_stock(db, {
+                producto_id: productos[producto_id].stock - restante
+                for producto_id, restante in disponible.items()
+                if productos[producto_id].stock != restante
+            })
+            
+            RollupService.record_orders(db, now.date(), [
+                (total, "pagado" if order_data.pago_inmediato else "pendiente")
+                for _, order_data, total, _ in accepted
+            ])
+            if pagos:
+                RollupService.record_payments(db, now.date(), [pago["monto"] for pago in pagos])
+            
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            # A code registered concurrently, after the check above: nothing of the batch is kept
+            if is_duplicate_code(e):
+                raise HTTPException(status_code=400, detail="Transfermóvil code already registered")
+            logger.exception("Error creating %s orders in bulk", len(accepted))
+            raise HTTPException(status_code=500, detail="Error creating orders")
+        except Exception:
+            db.rollback()
+            logger.exception("Error creating %s orders in bulk", len(accepted))
+            raise HTTPException(status_code=500, detail="Error creating orders")
+        ProductService.invalidate_catalog()
+        
+        return {
+            "created": len(accepted),
+            "failed": len(results) - len(accepted),
+            "results": results
+        }
+    
     @staticmethod
     def update_order(db: Session, order_id: int, order_data: OrderUpdate) -> Pedido:
         """Update order"""
@@ -122,6 +363,7 @@ class OrderService:
         if order.total_pagado >= order.total and order.estado == "pendiente":
             order.estado = "pagado"
             order.updated_at = datetime.utcnow()
+            RollupService.record_status_change(db, order.fecha_pedido.date(), order.total, "pendiente", "pagado")
             db.commit()
             db.refresh(order)
         
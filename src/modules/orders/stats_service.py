@@ -1,8 +1,9 @@
 """Statistics service for orders and sales"""
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from datetime import datetime, date
-from src.modules.orders.model import Pedido, DetallePedido
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from datetime import datetime, date, time, timedelta
+from src.modules.orders.model import Pedido, VentaDiaria
 from src.modules.payments.model import Pago
 from src.modules.products.model import Producto
 
@@ -11,29 +12,45 @@ class StatsService:
     """Service for sales and inventory statistics"""
     
     @staticmethod
-    def get_daily_sales(db: Session, target_date: date = None) -> dict:
-        """Get sales summary for a specific date"""
+    def _day_range(target_date: date) -> tuple:
+        """Half-open [start, end) timestamp range for a day, index friendly"""
+        start = datetime.combine(target_date, time.min)
+        return start, start + timedelta(days=1)
+    
+    @staticmethod
+    def _month_range(year: int, month: int) -> tuple:
+        """Half-open [start, end) timestamp range for a month"""
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        return start, end
+    
+    @staticmethod
+    def get_daily_sales_from_orders(db: Session, target_date: date = None) -> dict:
+        """Sales summary for a date, aggregated from pedidos and pagos instead of the rollup"""
         if target_date is None:
             target_date = date.today()
         
-        # Get all orders from target date
-        orders = db.query(Pedido).filter(
-            func.date(Pedido.fecha_pedido) == target_date
-        ).all()
-        
-        total_orders = len(orders)
-        total_sales = sum(order.total for order in orders)
-        
-        # Count by status
-        pending_orders = sum(1 for order in orders if order.estado == "pendiente")
-        paid_orders = sum(1 for order in orders if order.estado == "pagado")
+        start, end = StatsService._day_range(target_date)
         
-        # Get payments for today
-        payments = db.query(Pago).join(Pedido).filter(
-            func.date(Pago.fecha_pago) == target_date
-        ).all()
+        # Orders from target date, aggregated in one statement
+        total_orders, total_sales, pending_orders, paid_orders = db.query(
+            func.count(Pedido.id),
+            func.coalesce(func.sum(Pedido.total), 0),
+            func.count(Pedido.id).filter(Pedido.estado == "pendiente"),
+            func.count(Pedido.id).filter(Pedido.estado == "pagado")
+        ).filter(
+            Pedido.fecha_pedido >= start,
+            Pedido.fecha_pedido < end
+        ).one()
         
-        total_collected = sum(payment.monto for payment in payments)
+        # Payments for target date
+        payments_count, total_collected = db.query(
+            func.count(Pago.id),
+            func.coalesce(func.sum(Pago.monto), 0)
+        ).filter(
+            Pago.fecha_pago >= start,
+            Pago.fecha_pago < end
+        ).one()
         
         return {
             "date": target_date.isoformat(),
@@ -42,16 +59,88 @@ class StatsService:
             "total_collected": float(total_collected),
             "pending_orders": pending_orders,
             "paid_orders": paid_orders,
-            "payments_count": len(payments)
+            "payments_count": payments_count
         }
     
+    @staticmethod
+    def get_pending_orders_summary_from_orders(db: Session) -> dict:
+        """Summary of pending orders, aggregated from pedidos"""
+        row = db.query(
+            func.count(Pedido.id),
+            func.coalesce(func.sum(Pedido.total), 0)
+        ).filter(
+            Pedido.estado == "pendiente"
+        ).one()
+        return StatsService._pending_orders_result(row)
+    
+    @staticmethod
+    def get_monthly_sales_from_orders(db: Session, year: int = None, month: int = None) -> dict:
+        """Sales summary for a month, aggregated from pedidos"""
+        year, month = StatsService._month(year, month)
+        start, end = StatsService._month_range(year, month)
+        
+        row = db.query(
+            func.count(Pedido.id),
+            func.coalesce(func.sum(Pedido.total), 0)
+        ).filter(
+            Pedido.fecha_pedido >= start,
+            Pedido.fecha_pedido < end
+        ).one()
+        return StatsService._monthly_sales_result(year, month, row)
+    
+    @staticmethod
+    def _daily_sales_query(target_date: date):
+        # One rollup row per day, maintained by RollupService
+        return select(VentaDiaria).where(VentaDiaria.fecha == target_date)
+    
+    @staticmethod
+    def _daily_sales_result(target_date: date, dia) -> dict:
+        return {
+            "date": target_date.isoformat(),
+            "total_orders": dia.total_pedidos if dia else 0,
+            "total_sales": float(dia.total_ventas) if dia else 0.0,
+            "total_collected": float(dia.total_cobrado) if dia else 0.0,
+            "pending_orders": dia.pedidos_pendientes if dia else 0,
+            "paid_orders": dia.pedidos_pagados if dia else 0,
+            "payments_count": dia.cantidad_pagos if dia else 0
+        }
+    
+    @staticmethod
+    def get_daily_sales(db: Session, target_date: date = None) -> dict:
+        """Get sales summary for a specific date"""
+        if target_date is None:
+            target_date = date.today()
+        
+        dia = db.scalars(StatsService._daily_sales_query(target_date)).first()
+        return StatsService._daily_sales_result(target_date, dia)
+    
+    @staticmethod
+    async def get_daily_sales_async(db: AsyncSession, target_date: date = None) -> dict:
+        """Get sales summary for a specific date (async session)"""
+        if target_date is None:
+            target_date = date.today()
+        
+        dia = (await db.scalars(StatsService._daily_sales_query(target_date))).first()
+        return StatsService._daily_sales_result(target_date, dia)
+    
     @staticmethod
     def get_low_stock_products(db: Session) -> list:
         """Get products with stock below minimum"""
         products = db.query(Producto).filter(
             Producto.stock <= Producto.stock_minimo
         ).all()
-        
+        return StatsService._low_stock_result(products)
+    
+    @staticmethod
+    async def get_low_stock_products_async(db: AsyncSession) -> list:
+        """Get products with stock below minimum (async session)"""
+        products = await db.scalars(select(Producto).where(
+            Producto.stock <= Producto.stock_minimo
+        ))
+        return StatsService._low_stock_result(products.all())
+    
+    @staticmethod
+    def _low_stock_result(products) -> list:
         return [
             {
                 "id": p.id,
@@ -64,38 +153,73 @@ class StatsService:
         ]
     
     @staticmethod
-    def get_pending_orders_summary(db: Session) -> dict:
-        """Get summary of pending orders"""
-        pending_orders = db.query(Pedido).filter(
-            Pedido.estado == "pendiente"
-        ).all()
-        
-        total_pending_amount = sum(order.total for order in pending_orders)
-        
+    def _pending_orders_query():
+        return select(
+            func.coalesce(func.sum(VentaDiaria.pedidos_pendientes), 0),
+            func.coalesce(func.sum(VentaDiaria.monto_pendiente), 0)
+        )
+    
+    @staticmethod
+    def _pending_orders_result(row) -> dict:
+        count, total_pending_amount = row
         return {
-            "count": len(pending_orders),
+            "count": int(count),
             "total_amount": float(total_pending_amount)
         }
     
     @staticmethod
-    def get_monthly_sales(db: Session, year: int = None, month: int = None) -> dict:
-        """Get sales summary for a specific month"""
+    def get_pending_orders_summary(db: Session) -> dict:
+        """Get summary of pending orders"""
+        row = db.execute(StatsService._pending_orders_query()).one()
+        return StatsService._pending_orders_result(row)
+    
+    @staticmethod
+    async def get_pending_orders_summary_async(db: AsyncSession) -> dict:
+        """Get summary of pending orders (async session)"""
+        row = (await db.execute(StatsService._pending_orders_query())).one()
+        return StatsService._pending_orders_result(row)
+    
+    @staticmethod
+    def _month(year: int = None, month: int = None) -> tuple:
         if year is None or month is None:
             today = date.today()
             year = today.year
             month = today.month
+        return year, month
+    
+    @staticmethod
+    def _monthly_sales_query(year: int, month: int):
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
         
-        # Get all orders from target month
-        orders = db.query(Pedido).filter(
-            func.extract('year', Pedido.fecha_pedido) == year,
-            func.extract('month', Pedido.fecha_pedido) == month
-        ).all()
-        
-        total_sales = sum(order.total for order in orders)
-        
+        return select(
+            func.coalesce(func.sum(VentaDiaria.total_pedidos), 0),
+            func.coalesce(func.sum(VentaDiaria.total_ventas), 0)
+        ).where(
+            VentaDiaria.fecha >= start,
+            VentaDiaria.fecha < end
+        )
+    
+    @staticmethod
+    def _monthly_sales_result(year: int, month: int, row) -> dict:
+        total_orders, total_sales = row
         return {
             "year": year,
             "month": month,
-            "total_orders": len(orders),
+            "total_orders": int(total_orders),
             "total_sales": float(total_sales)
         }
+    
+    @staticmethod
+    def get_monthly_sales(db: Session, year: int = None, month: int = None) -> dict:
+        """Get sales summary for a specific month"""
+        year, month = StatsService._month(year, month)
+        row = db.execute(StatsService._monthly_sales_query(year, month)).one()
+        return StatsService._monthly_sales_result(year, month, row)
+    
+    @staticmethod
+    async def get_monthly_sales_async(db: AsyncSession, year: int = None, month: int = None) -> dict:
+        """Get sales summary for a specific month (async session)"""
+        year, month = StatsService._month(year, month)
+        row = (await db.execute(StatsService._monthly_sales_query(year, month))).one()
+        return StatsService._monthly_sales_result(year, month, row)
@@ -1,5 +1,6 @@
 """Payment model"""
-from sqlalchemy import Column, Integer, Numeric, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Numeric, String, DateTime, ForeignKey, Index
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.core.database import Base
@@ -13,8 +14,22 @@ class Pago(Base):
     monto = Column(Numeric, nullable=False)
     cuenta_origen = Column(String(100), nullable=False)
     codigo_transfermovil = Column(String(100), nullable=True)
-    fecha_pago = Column(DateTime, default=datetime.utcnow, nullable=False)
+    fecha_pago = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
     pedido = relationship("Pedido", back_populates="pagos")
+
+
+# A Transfermóvil code can only be registered once (migration 0005)
+CODIGO_TRANSFERMOVIL_INDEX = "ix_pagos_codigo_transfermovil"
+Index(
+    CODIGO_TRANSFERMOVIL_INDEX, Pago.codigo_transfermovil,
+    unique=True, postgresql_where=Pago.codigo_transfermovil.isnot(None)
+)
+
+
+def is_duplicate_code(error: IntegrityError) -> bool:
+    """True if the error comes from a Transfermóvil code that is already registered"""
+    diag = getattr(error.orig, "diag", None)
+    return getattr(diag, "constraint_name", None) == CODIGO_TRANSFERMOVIL_INDEX
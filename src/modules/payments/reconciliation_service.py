@@ -0,0 +1,239 @@
+"""Reconciliation of Transfermóvil bank statements against pending orders"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, case
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException
+from src.modules.payments.model import Pago, is_duplicate_code
+from src.modules.orders.model import Pedido
+from src.modules.clients.model import Cliente
+from src.modules.orders.rollup_service import RollupService
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Iterator
+import csv
+import io
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("codigo_transfermovil", "monto", "cuenta_origen")
+
+# An order is considered paid when less than 1 cent is pending
+PAID_TOLERANCE = Decimal("0.01")
+
+# Times an import is reconciled again after a concurrent payment took one of its codes
+DUPLICATE_RETRIES = 3
+
+
+def parse_statement(file: BinaryIO) -> Iterator[dict]:
+    """
+    Read a statement CSV line by line. Columns: codigo_transfermovil, monto,
+    cuenta_origen, and optionally fecha (ISO) and pedido_id. Comma or semicolon separated.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    header = text.readline()
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    reader = csv.DictReader(itertools.chain([header], text), delimiter=delimiter)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    
+    missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing statement columns: {', '.join(missing)}")
+    
+    for row in reader:
+        line = {"line": reader.line_num, "error": None}
+        try:
+            line["codigo_transfermovil"] = (row["codigo_transfermovil"] or "").strip()
+            line["cuenta_origen"] = (row["cuenta_origen"] or "").strip()
+            line["monto"] = Decimal((row["monto"] or "").strip())
+            fecha = (row.get("fecha") or "").strip()
+            line["fecha"] = datetime.fromisoformat(fecha) if fecha else None
+            pedido_id = (row.get("pedido_id") or "").strip()
+            line["pedido_id"] = int(pedido_id) if pedido_id else None
+        except (InvalidOperation, ValueError):
+            line["error"] = "Invalid amount, date or order id"
+        else:
+            if not line["codigo_transfermovil"] or not line["cuenta_origen"]:
+                line["error"] = "Missing codigo_transfermovil or cuenta_origen"
+            elif line["monto"] <= 0:
+                line["error"] = "Amount must be positive"
+        yield line
+
+
+class ReconciliationService:
+    """Bulk import of Transfermóvil payments: match, detect duplicates, apply in one transaction"""
+    
+    @staticmethod
+    def pending_orders(db: Session, cuentas: set) -> dict:
+        """Pending orders of the clients paying from these accounts, locked, oldest first per account"""
+        rows = db.execute(
+            select(Pedido.id, Pedido.fecha_pedido, Pedido.total, Pedido.total_pagado, Cliente.cuenta_de_pago)
+            .join(Cliente, Cliente.id == Pedido.cliente_id)
+            .where(Cliente.cuenta_de_pago.in_(cuentas), Pedido.estado == "pendiente")
+            .order_by(Pedido.fecha_pedido, Pedido.id)
+            .with_for_update(of=Pedido)
+        ).all()
+        
+        por_cuenta = {}
+        for pedido_id, fecha_pedido, total, total_pagado, cuenta in rows:
+            por_cuenta.setdefault(cuenta, []).append({
+                "id": pedido_id,
+                "fecha_pedido": fecha_pedido,
+                "total": total,
+                "pendiente": total - total_pagado,
+                "abonado": Decimal(0),
+            })
+        return por_cuenta
+    
+    @staticmethod
+    def match(line: dict, candidatos: list):
+        """
+        Order a statement line pays: the one named in pedido_id, else the oldest
+        whose pending amount equals the line, else the oldest that can absorb it
+        """
+        abiertos = [pedido for pedido in candidatos if pedido["pendiente"] > PAID_TOLERANCE]
+        if line["pedido_id"] is not None:
+            pedido = next((p for p in abiertos if p["id"] == line["pedido_id"]), None)
+            if pedido is None:
+                return None, "Order is not pending for this account"
+            if line["monto"] > pedido["pendiente"]:
+                return None, f"Payment amount (${line['monto']}) exceeds remaining balance (${pedido['pendiente']})"
+            return pedido, None
+        
+        pedido = next((p for p in abiertos if p["pendiente"] == line["monto"]), None)
+        if pedido is None:
+            pedido = next((p for p in abiertos if p["pendiente"] >= line["monto"]), None)
+        if pedido is None:
+            return None, "No pending order of this account matches the amount"
+        return pedido, None
+    
+    @staticmethod
+    def import_statement(db: Session, file: BinaryIO, dry_run: bool = False) -> dict:
+        """Reconcile a statement file; with dry_run the report is built but nothing is applied"""
+        lines = list(parse_statement(file))
+        for attempt in range(DUPLICATE_RETRIES + 1):
+            try:
+                return ReconciliationService.reconcile(db, lines, dry_run)
+            except IntegrityError as e:
+                db.rollback()
+                if not is_duplicate_code(e):
+                    logger.exception("Error applying statement payments")
+                    raise HTTPException(status_code=500, detail="Error applying payments")
+                # A payment with one of the codes committed after the duplicate check:
+                # reconcile again, that line is now reported as a duplicate
+                logger.info("Statement import hit a concurrently registered code (attempt %s)", attempt + 1)
+        raise HTTPException(status_code=409, detail="Payments with these codes are being registered concurrently, try again")
+    
+    @staticmethod
+    def reconcile(db: Session, lines: list, dry_run: bool) -> dict:
+        """Match the parsed lines and apply them; raises IntegrityError if a code was registered meanwhile"""
+        results = [
+            {
+                "line": line["line"],
+                "codigo_transfermovil": line.get("codigo_transfermovil"),
+                "monto": line.get("monto"),
+                "cuenta_origen": line.get("cuenta_origen"),
+                "status": "invalid" if line["error"] else None,
+                "pedido_id": None,
+                "error": line["error"],
+            }
+            for line in lines
+        ]
+        validas = [(result, line) for result, line in zip(results, lines) if not line["error"]]
+        
+        # Lock the candidate orders before looking for duplicates, so an import running
+        # concurrently with the same lines sees the payments of the other one once it commits
+        por_cuenta = ReconciliationService.pending_orders(db, {line["cuenta_origen"] for _, line in validas})
+        codigos = {line["codigo_transfermovil"] for _, line in validas}
+        registrados = set(db.scalars(
+            select(Pago.codigo_transfermovil).where(Pago.codigo_transfermovil.in_(codigos))
+        )) if codigos else set()
+        
+        now = datetime.utcnow()
+        pagos = []
+        for result, line in validas:
+            codigo = line["codigo_transfermovil"]
+            if codigo in registrados:
+                result["status"] = "duplicate"
+                result["error"] = "Transfermóvil code already registered"
+                continue
+            registrados.add(codigo)
+            
+            pedido, error = ReconciliationService.match(line, por_cuenta.get(line["cuenta_origen"], []))
+            if pedido is None:
+                result["status"] = "unmatched"
+                result["error"] = error
+                continue
+            
+            pedido["pendiente"] -= line["monto"]
+            pedido["abonado"] += line["monto"]
+            result["status"] = "applied"
+            result["pedido_id"] = pedido["id"]
+            pagos.append({
+                "pedido_id": pedido["id"],
+                "monto": line["monto"],
+                "cuenta_origen": line["cuenta_origen"],
+                "codigo_transfermovil": codigo,
+                "fecha_pago": line["fecha"] or now,
+                "created_at": now
+            })
+        
+        abonados = [pedido for candidatos in por_cuenta.values() for pedido in candidatos if pedido["abonado"]]
+        if pagos and not dry_run:
+            try:
+                ReconciliationService.apply(db, pagos, abonados)
+                db.commit()
+            except IntegrityError:
+                raise
+            except Exception:
+                db.rollback()
+                logger.exception("Error applying statement payments")
+                raise HTTPException(status_code=500, detail="Error applying payments")
+        else:
+            db.rollback()
+        
+        statuses = Counter(result["status"] for result in results)
+        return {
+            "dry_run": dry_run,
+            "lines": len(results),
+            "applied": statuses["applied"],
+            "duplicates": statuses["duplicate"],
+            "unmatched": statuses["unmatched"],
+            "invalid": statuses["invalid"],
+            "amount_applied": sum((pago["monto"] for pago in pagos), Decimal(0)),
+            "orders_paid": sum(1 for pedido in abonados if pedido["pendiente"] <= PAID_TOLERANCE),
+            "results": results
+        }
+    
+    @staticmethod
+    def apply(db: Session, pagos: list, abonados: list):
+        """Insert the matched payments and update their orders with one statement each (no commit)"""
+        db.execute(insert(Pago), pagos)
+        
+        pagados = [pedido for pedido in abonados if pedido["pendiente"] <= PAID_TOLERANCE]
+        db.execute(
+            update(Pedido)
+            .where(Pedido.id.in_([pedido["id"] for pedido in abonados]))
+            .values(
+                total_pagado=Pedido.total_pagado + case(
+                    {pedido["id"]: pedido["abonado"] for pedido in abonados}, value=Pedido.id
+                ),
+                estado=case(
+                    {pedido["id"]: "pagado" for pedido in pagados}, value=Pedido.id, else_=Pedido.estado
+                ) if pagados else Pedido.estado,
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        
+        RollupService.record_status_changes(db, [
+            (pedido["fecha_pedido"].date(), pedido["total"], "pendiente", "pagado") for pedido in pagados
+        ])
+        por_dia = {}
+        for pago in pagos:
+            por_dia.setdefault(pago["fecha_pago"].date(), []).append(pago["monto"])
+        # Sorted by day, as in record_status_changes
+        for fecha in sorted(por_dia):
+            RollupService.record_payments(db, fecha, por_dia[fecha])
@@ -1,11 +1,18 @@
 """Payment API routes"""
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, File, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from src.core.database import get_db
-from src.core.deps import require_role
-from src.modules.payments.schema import PaymentCreate, PaymentResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import date
+from src.core.database import get_db, get_async_db
+from src.core.deps import require_role, require_role_async
+from src.core.streaming import stream_ndjson, stream_csv, NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE
+from src.modules.payments.schema import (
+    PaymentCreate, PaymentResponse, PaymentSummaryBatchRequest, PaymentSummaryBatchResponse, ReconciliationReport
+)
 from src.modules.payments.service import PaymentService
+from src.modules.payments.reconciliation_service import ReconciliationService
 
 router = APIRouter(prefix="/api/payments", tags=["payments"])
 
@@ -30,6 +37,16 @@ def get_order_payment_summary(
     return PaymentService.get_order_payment_summary(db, order_id)
 
 
+@router.post("/summaries", response_model=PaymentSummaryBatchResponse)
+async def get_payment_summaries(
+    request: PaymentSummaryBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role_async(["admin", "supervisor", "vendedor"]))
+):
+    """Payment summaries of many orders at once (e.g. a page of the orders screen)"""
+    return await PaymentService.get_payment_summaries_async(db, request.order_ids, request.include_pagos)
+
+
 @router.post("/", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
 def create_payment(
     payment_data: PaymentCreate,
@@ -40,6 +57,41 @@ def create_payment(
     return PaymentService.create_payment(db, payment_data)
 
 
+@router.post("/import/transfermovil", response_model=ReconciliationReport)
+def import_transfermovil_statement(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_role(["admin", "supervisor"]))
+):
+    """Reconcile a Transfermóvil statement (CSV) against pending orders - matched payments are applied in one transaction"""
+    return ReconciliationService.import_statement(db, file.file, dry_run)
+
+
+@router.get("/export.ndjson")
+def export_payments_ndjson(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user = Depends(require_role(["admin", "supervisor"]))
+):
+    """Stream payments made in the date range as NDJSON (one payment per line)"""
+    return StreamingResponse(stream_ndjson(PaymentService.export_query(desde, hasta)), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/export.csv")
+def export_payments_csv(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user = Depends(require_role(["admin", "supervisor"]))
+):
+    """Stream payments made in the date range as CSV"""
+    return StreamingResponse(
+        stream_csv(PaymentService.export_query(desde, hasta)),
+        media_type=CSV_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename=pagos_{desde or 'inicio'}_{hasta or date.today()}.csv"}
+    )
+
+
 @router.get("/{payment_id}", response_model=PaymentResponse)
 def get_payment(
     payment_id: int,
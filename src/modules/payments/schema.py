@@ -2,7 +2,7 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 
 class PaymentBase(BaseModel):
@@ -23,3 +23,46 @@ class PaymentResponse(PaymentBase):
     
     class Config:
         from_attributes = True
+
+
+class PaymentSummaryBatchRequest(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=500)
+    include_pagos: bool = False
+
+
+class PaymentSummary(BaseModel):
+    order_id: int
+    total: float
+    total_pagado: float
+    saldo_pendiente: float
+    estado: str
+    cantidad_pagos: int
+    ultimo_pago: Optional[datetime] = None
+    pagos: Optional[List[PaymentResponse]] = None
+
+
+class PaymentSummaryBatchResponse(BaseModel):
+    summaries: List[PaymentSummary]
+    not_found: List[int]
+
+
+class ReconciliationResult(BaseModel):
+    line: int
+    codigo_transfermovil: Optional[str] = None
+    monto: Optional[Decimal] = None
+    cuenta_origen: Optional[str] = None
+    status: str  # applied, duplicate, unmatched, invalid
+    pedido_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class ReconciliationReport(BaseModel):
+    dry_run: bool
+    lines: int
+    applied: int
+    duplicates: int
+    unmatched: int
+    invalid: int
+    amount_applied: Decimal
+    orders_paid: int
+    results: List[ReconciliationResult]
@@ -1,12 +1,18 @@
 """Payment business logic"""
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, case, func
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
-from src.modules.payments.model import Pago
+from src.modules.payments.model import Pago, is_duplicate_code
 from src.modules.payments.schema import PaymentCreate
 from src.modules.orders.model import Pedido
 from src.modules.orders.service import OrderService
+from src.modules.orders.rollup_service import RollupService
+from src.core.streaming import date_range_filters
+from datetime import date
 from decimal import Decimal
+from typing import List, Optional
 
 
 class PaymentService:
@@ -24,55 +30,84 @@ class PaymentService:
         """List all payments for an order"""
         return db.query(Pago).filter(Pago.pedido_id == order_id).all()
     
+    @staticmethod
+    def export_query(desde: Optional[date] = None, hasta: Optional[date] = None):
+        """Payment rows made in the date range, as plain columns for streaming exports"""
+        return select(*Pago.__table__.columns)\
+            .where(*date_range_filters(Pago.fecha_pago, desde, hasta))\
+            .order_by(Pago.id)
+    
     @staticmethod
     def create_payment(db: Session, payment_data: PaymentCreate) -> Pago:
         """Create new payment and update order status"""
-        # Verify order exists
-        order = db.query(Pedido).filter(Pedido.id == payment_data.pedido_id).first()
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
-        
-        # Check if order is already fully paid
-        if order.estado == "pagado":
-            raise HTTPException(status_code=400, detail="Order is already fully paid")
-        
-        # Use database function to calculate pending amount (accurate calculation)
-        result = db.execute(
-            text("SELECT calcular_monto_pendiente(:order_id)"),
-            {"order_id": payment_data.pedido_id}
-        ).scalar()
+        monto = payment_data.monto
         
-        monto_pendiente = Decimal(str(result))
-        
-        # Check if payment exceeds remaining amount
-        if payment_data.monto > monto_pendiente:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Payment amount (${payment_data.monto}) exceeds remaining balance (${monto_pendiente})"
+        # Apply the payment with a conditional update: the balance check and the increment
+        # happen on the locked row, so concurrent payments can never overpay the order
+        anterior = select(Pedido.id, Pedido.estado)\
+            .where(Pedido.id == payment_data.pedido_id)\
+            .with_for_update()\
+            .subquery()
+        order = db.execute(
+            update(Pedido)
+            .where(
+                Pedido.id == anterior.c.id,
+                Pedido.estado != "pagado",
+                Pedido.total - Pedido.total_pagado >= monto
+            )
+            .values(
+                total_pagado=Pedido.total_pagado + monto,
+                # Consider paid if less than 1 cent pending
+                estado=case((Pedido.total - Pedido.total_pagado - monto <= Decimal('0.01'), "pagado"), else_=Pedido.estado)
             )
+            .returning(Pedido.fecha_pedido, Pedido.total, Pedido.estado, anterior.c.estado.label("estado_anterior"))
+            .execution_options(synchronize_session=False)
+        ).first()
         
-        # Create payment
+        if order is None:
+            db.rollback()
+            PaymentService._reject_payment(db, payment_data)
+        
+        # Create payment in the same transaction
         db_payment = Pago(**payment_data.model_dump())
         db.add(db_payment)
+        try:
+            db.flush()
+        except IntegrityError as e:
+            db.rollback()
+            if is_duplicate_code(e):
+                raise HTTPException(status_code=400, detail="Transfermóvil code already registered")
+            raise
         
-        # Update order total_pagado
-        order.total_pagado += payment_data.monto
-        
-        # Update order status if fully paid
-        new_pending = monto_pendiente - payment_data.monto
-        if new_pending <= Decimal('0.01'):  # Consider paid if less than 1 cent pending
-            order.estado = "pagado"
+        RollupService.record_status_change(db, order.fecha_pedido.date(), order.total, order.estado_anterior, order.estado)
+        RollupService.record_payments(db, db_payment.fecha_pago.date(), [db_payment.monto])
         
         db.commit()
         db.refresh(db_payment)
         
         return db_payment
     
+    @staticmethod
+    def _reject_payment(db: Session, payment_data: PaymentCreate):
+        """Explain why the conditional update matched no order"""
+        order = db.query(Pedido).filter(Pedido.id == payment_data.pedido_id).first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        
+        if order.estado == "pagado":
+            raise HTTPException(status_code=400, detail="Order is already fully paid")
+        
+        monto_pendiente = order.total - order.total_pagado
+        raise HTTPException(
+            status_code=400,
+            detail=f"Payment amount (${payment_data.monto}) exceeds remaining balance (${monto_pendiente})"
+        )
+    
     @staticmethod
     def get_order_payment_summary(db: Session, order_id: int):
         """Get payment summary for an order"""
-        order = OrderService.get_by_id(db, order_id)
-        payments = PaymentService.list_payments_by_order(db, order_id)
+        order = OrderService.get_by_id(db, order_id, include_pagos=True)
+        payments = order.pagos
         
         return {
             "order_id": order.id,
@@ -83,3 +118,49 @@ class PaymentService:
             "cantidad_pagos": len(payments),
             "pagos": payments
         }
+    
+    @staticmethod
+    async def get_payment_summaries_async(db: AsyncSession, order_ids: List[int], include_pagos: bool = False) -> dict:
+        """Payment summaries of many orders from one query grouped by pedido_id (plus one for the payments if requested)"""
+        order_ids = list(dict.fromkeys(order_ids))
+        
+        pagos = select(
+            Pago.pedido_id,
+            func.count(Pago.id).label("cantidad_pagos"),
+            func.max(Pago.fecha_pago).label("ultimo_pago")
+        ).where(Pago.pedido_id.in_(order_ids)).group_by(Pago.pedido_id).subquery()
+        
+        result = await db.execute(
+            select(
+                Pedido.id, Pedido.total, Pedido.total_pagado, Pedido.estado,
+                func.coalesce(pagos.c.cantidad_pagos, 0), pagos.c.ultimo_pago
+            )
+            .outerjoin(pagos, pagos.c.pedido_id == Pedido.id)
+            .where(Pedido.id.in_(order_ids))
+        )
+        summaries = {
+            order_id: {
+                "order_id": order_id,
+                "total": float(total),
+                "total_pagado": float(total_pagado),
+                "saldo_pendiente": float(total - total_pagado),
+                "estado": estado,
+                "cantidad_pagos": cantidad_pagos,
+                "ultimo_pago": ultimo_pago,
+            }
+            for order_id, total, total_pagado, estado, cantidad_pagos, ultimo_pago in result.all()
+        }
+        
+        if include_pagos and summaries:
+            for summary in summaries.values():
+                summary["pagos"] = []
+            payments = await db.scalars(
+                select(Pago).where(Pago.pedido_id.in_(summaries.keys())).order_by(Pago.pedido_id, Pago.fecha_pago)
+            )
+            for payment in payments:
+                summaries[payment.pedido_id]["pagos"].append(payment)
+        
+        return {
+            "summaries": [summaries[order_id] for order_id in order_ids if order_id in summaries],
+            "not_found": [order_id for order_id in order_ids if order_id not in summaries]
+        }
@@ -1,5 +1,5 @@
 """Producto model"""
-from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime
+from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, Index
 from datetime import datetime
 from src.core.database import Base
 
@@ -15,3 +15,7 @@ class Producto(Base):
     stock_minimo = Column(Integer, nullable=False, default=5)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+# Newest-first keyset pagination (migration 0006)
+Index("ix_productos_created_id", Producto.created_at.desc(), Producto.id.desc())
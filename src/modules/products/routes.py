@@ -1,9 +1,11 @@
 """Product API routes"""
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
-from src.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from src.core.database import get_db, get_async_db
 from src.core.deps import require_role
+from src.core.base_service import BaseService
 from src.modules.products.schema import ProductCreate, ProductUpdate, ProductResponse
 from src.modules.products.service import ProductService
 from src.modules.orders.stats_service import StatsService
@@ -12,20 +14,35 @@ router = APIRouter(prefix="/api/products", tags=["products"])
 
 
 @router.get("/catalog", response_model=List[ProductResponse])
-def get_public_catalog(db: Session = Depends(get_db)):
-    """Public catalog - no authentication required"""
-    return ProductService.list_public_catalog(db)
+async def get_public_catalog(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Public catalog - no authentication required, answers If-None-Match with 304"""
+    body, etag = await ProductService.get_rendered_catalog_async(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
 
 
 @router.get("/", response_model=List[ProductResponse])
 def list_products(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(require_role(["admin", "supervisor", "vendedor"]))
 ):
     """List all products - authenticated users"""
-    return ProductService.list_products(db, skip, limit)
+    products = ProductService.list_products(db, skip, limit, cursor)
+    BaseService.set_next_cursor(response, products, limit, cursor)
+    return products
 
 
 @router.get("/low-stock", response_model=List[ProductResponse])
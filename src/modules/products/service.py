@@ -1,36 +1,82 @@
 """Product business logic"""
+from typing import List, Optional
+from pydantic import TypeAdapter
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.modules.products.model import Producto
-from src.modules.products.schema import ProductCreate, ProductUpdate
+from src.modules.products.schema import ProductCreate, ProductUpdate, ProductResponse
 from src.core.base_service import BaseService
+from src.core.cache import TTLCache
+from src.config.settings import get_settings
+import hashlib
+
+settings = get_settings()
+
+# Rendered catalog (body, etag) keyed by catalog version; the TTL bounds staleness
+# for writes made by other worker processes
+catalog_cache = TTLCache(max_size=1, ttl=settings.CATALOG_CACHE_TTL_SECONDS)
+catalog_adapter = TypeAdapter(List[ProductResponse])
 
 
 class ProductService:
     base = BaseService(Producto)
+    catalog_version = 0
     
     @staticmethod
     def get_by_id(db: Session, product_id: int) -> Producto:
         return ProductService.base.get_by_id(db, product_id, "Product not found")
     
     @staticmethod
-    def list_products(db: Session, skip: int = 0, limit: int = 100):
-        return ProductService.base.list_all(db, skip, limit)
+    def list_products(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+        return ProductService.base.list_all(db, skip, limit, cursor)
     
     @staticmethod
     def list_public_catalog(db: Session):
         return db.query(Producto).filter(Producto.stock > 0).all()
     
+    @staticmethod
+    async def list_public_catalog_async(db: AsyncSession):
+        result = await db.execute(select(Producto).where(Producto.stock > 0))
+        return result.scalars().all()
+    
+    @staticmethod
+    async def get_rendered_catalog_async(db: AsyncSession) -> tuple:
+        """Catalog JSON body and its strong ETag, queried and rendered once per version"""
+        version = ProductService.catalog_version
+        cached = catalog_cache.get(version)
+        if cached is None:
+            productos = await ProductService.list_public_catalog_async(db)
+            body = catalog_adapter.dump_json(catalog_adapter.validate_python(productos, from_attributes=True))
+            cached = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+            # Stored under the version read before the query, so a render racing
+            # with an invalidation is never served
+            catalog_cache.set(version, cached)
+        return cached
+    
+    @staticmethod
+    def invalidate_catalog():
+        """Drop the cached catalog after product or stock changes"""
+        ProductService.catalog_version += 1
+        catalog_cache.clear()
+    
     @staticmethod
     def create_product(db: Session, product_data: ProductCreate) -> Producto:
-        return ProductService.base.create(db, product_data.model_dump())
+        product = ProductService.base.create(db, product_data.model_dump())
+        ProductService.invalidate_catalog()
+        return product
     
     @staticmethod
     def update_product(db: Session, product_id: int, product_data: ProductUpdate) -> Producto:
-        return ProductService.base.update(db, product_id, product_data.model_dump(exclude_unset=True))
+        product = ProductService.base.update(db, product_id, product_data.model_dump(exclude_unset=True))
+        ProductService.invalidate_catalog()
+        return product
     
     @staticmethod
     def delete_product(db: Session, product_id: int):
-        return ProductService.base.delete(db, product_id)
+        result = ProductService.base.delete(db, product_id)
+        ProductService.invalidate_catalog()
+        return result
     
     @staticmethod
     def check_low_stock(db: Session):
@@ -1,5 +1,5 @@
 """Usuario model - based on existing database table"""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
 from datetime import datetime
 from src.core.database import Base
 
@@ -15,3 +15,7 @@ class Usuario(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+# Newest-first keyset pagination (migration 0006)
+Index("ix_usuarios_created_id", Usuario.created_at.desc(), Usuario.id.desc())
@@ -1,38 +1,45 @@
 """User API routes"""
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from src.core.database import get_db
-from src.core.deps import get_current_user, require_role
+from src.core.deps import get_current_user, require_role, CurrentUser
+from src.core.base_service import BaseService
 from src.modules.users.schema import UserCreate, UserUpdate, UserResponse
 from src.modules.users.service import UserService
-from src.modules.users.model import Usuario
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: Usuario = Depends(get_current_user)):
+def get_current_user_info(
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """Get current user information"""
-    return current_user
+    return UserService.get_by_id(db, current_user.id)
 
 
 @router.get("/", response_model=List[UserResponse])
 def list_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin"]))
+    current_user: CurrentUser = Depends(require_role(["admin"]))
 ):
     """List all users - Admin only"""
-    return UserService.list_users(db, skip, limit)
+    users = UserService.list_users(db, skip, limit, cursor)
+    BaseService.set_next_cursor(response, users, limit, cursor)
+    return users
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin"]))
+    current_user: CurrentUser = Depends(require_role(["admin"]))
 ):
     """Get user by ID - Admin only"""
     return UserService.get_by_id(db, user_id)
@@ -42,7 +49,7 @@ def get_user(
 def create_user(
     user_data: UserCreate,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin"]))
+    current_user: CurrentUser = Depends(require_role(["admin"]))
 ):
     """Create new user - Admin only"""
     return UserService.create_user(db, user_data)
@@ -53,7 +60,7 @@ def update_user(
     user_id: int,
     user_data: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin"]))
+    current_user: CurrentUser = Depends(require_role(["admin"]))
 ):
     """Update user - Admin only"""
     return UserService.update_user(db, user_id, user_data)
@@ -63,7 +70,7 @@ def update_user(
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin"]))
+    current_user: CurrentUser = Depends(require_role(["admin"]))
 ):
     """Deactivate user - Admin only"""
     return UserService.delete_user(db, user_id)
@@ -4,7 +4,10 @@ from fastapi import HTTPException, status
 from src.modules.users.model import Usuario
 from src.modules.users.schema import UserCreate, UserUpdate
 from src.core.security import get_password_hash
+from src.core.base_service import BaseService
+from src.core.deps import user_cache
 from datetime import datetime
+from typing import Optional
 
 
 class UserService:
@@ -28,8 +31,10 @@ class UserService:
         return db.query(Usuario).filter(Usuario.email == email).first()
     
     @staticmethod
-    def list_users(db: Session, skip: int = 0, limit: int = 100):
+    def list_users(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
         """List all users"""
+        if cursor is not None:
+            return BaseService.keyset(db.query(Usuario), Usuario, limit, cursor).all()
         return db.query(Usuario).offset(skip).limit(limit).all()
     
     @staticmethod
@@ -76,6 +81,7 @@ class UserService:
         
         user.updated_at = datetime.utcnow()
         db.commit()
+        user_cache.invalidate(user_id)
         db.refresh(user)
         return user
     
@@ -86,4 +92,5 @@ class UserService:
         user.is_active = False
         user.updated_at = datetime.utcnow()
         db.commit()
+        user_cache.invalidate(user_id)
         return {"message": "User deactivated successfully"}
@@ -0,0 +1,52 @@
+"""Audit log filters and error responses"""
+from sqlalchemy import select
+from src.modules.audit.model import AuditLog
+from src.modules.audit.schema import AuditLogFilters
+from src.modules.audit.service import AuditService
+import pytest
+
+ENDPOINTS = [
+    "/api/orders", "/api/orders/", "/api/orders/5", "/api/orders0", "/api/ordersx", "/api/products",
+    "/x\U0010ffff", "/x\U0010ffff/1", "/y", "/50%/a", "/50x/a",
+]
+
+
+@pytest.mark.parametrize("prefix, expected", [
+    ("/api/orders", {"/api/orders", "/api/orders/", "/api/orders/5", "/api/orders0", "/api/ordersx"}),
+    ("/api/orders/", {"/api/orders/", "/api/orders/5"}),
+    ("/x\U0010ffff", {"/x\U0010ffff", "/x\U0010ffff/1"}),
+    ("/50%", {"/50%/a"}),
+])
+def test_endpoint_prefix_filter(db, prefix, expected):
+    db.add_all([AuditLog(endpoint=endpoint, metodo_http="GET", status_code=200) for endpoint in ENDPOINTS])
+    db.commit()
+    
+    conditions = AuditService._conditions(AuditLogFilters(endpoint=prefix))
+    
+    assert set(db.scalars(select(AuditLog.endpoint).where(*conditions))) == expected
+
+
+@pytest.mark.parametrize("prefix, upper", [
+    ("/api/orders", "/api/ordert"),
+    ("/api/orders/", None),
+    ("/x\U0010ffff", None),
+    ("/x\ud7ff", None),
+])
+def test_prefix_upper_bound(prefix, upper):
+    assert AuditService._prefix_upper_bound(prefix) == upper
+
+
+@pytest.mark.parametrize("url, method", [
+    ("/api/audit/logs", "query_logs_async"),
+    ("/api/audit/users/1/logs", "query_logs_async"),
+    ("/api/audit/logs/count", "count_logs_async"),
+])
+def test_database_errors_are_not_sent_to_the_client(db, api, make_usuario, auth_headers, monkeypatch, url, method):
+    async def fail(*args, **kwargs):
+        raise Exception('relation "logs_acciones_secret" does not exist')
+    monkeypatch.setattr(AuditService, method, fail)
+    
+    response = api.get(url, headers=auth_headers(make_usuario()))
+    
+    assert response.status_code == 500
+    assert "logs_acciones_secret" not in response.text
@@ -0,0 +1,46 @@
+"""Which requests AuditPolicy sends to the audit log"""
+from src.core.audit_policy import AuditPolicy
+import pytest
+
+CATALOG = "/api/products/catalog"
+
+
+@pytest.fixture
+def policy():
+    return AuditPolicy(read_sample_rate=1.0, route_sample_rates={CATALOG: 0.0}, skip_routes=["/health"])
+
+
+def test_skip_routes_are_not_audited_unless_they_fail(policy):
+    assert not policy.should_audit("GET", "/health", 200)
+    assert not policy.should_audit("POST", "/health", 201)
+    assert policy.should_audit("GET", "/health", 500)
+    assert policy.stats["skipped_routes"] == 2
+
+
+def test_mutations_are_always_audited(policy):
+    for method in ("POST", "PUT", "PATCH", "DELETE"):
+        assert policy.should_audit(method, CATALOG, 200)
+    assert policy.stats["audited_mutations"] == 4
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 404, 422, 500, 503])
+def test_errors_are_always_audited(policy, status_code):
+    assert policy.should_audit("GET", CATALOG, status_code)
+    assert policy.stats["audited_errors"] == 1
+
+
+@pytest.mark.parametrize("status_code", [200, 204, 301, 304])
+def test_successful_and_not_modified_reads_are_sampled(policy, status_code):
+    assert not policy.should_audit("GET", CATALOG, status_code)
+    assert policy.stats["sampled_out"] == 1
+    assert policy.stats["audited_errors"] == 0
+
+
+def test_route_sample_rate_overrides_default(monkeypatch):
+    policy = AuditPolicy(read_sample_rate=0.5, route_sample_rates={CATALOG: 0.1}, skip_routes=[])
+    monkeypatch.setattr("src.core.audit_policy.random.random", lambda: 0.3)
+    
+    assert not policy.should_audit("GET", CATALOG, 304)
+    assert policy.should_audit("GET", "/api/orders/", 200)
+    assert policy.metrics()["audited_reads"] == 1
+    assert policy.metrics()["audited_fraction"] == 0.5
@@ -0,0 +1,67 @@
+"""Authenticated user cache in get_current_user"""
+from sqlalchemy import update
+from src.core.database import engine
+from src.core.deps import CurrentUser, user_cache
+from src.modules.users.model import Usuario
+from src.modules.users.schema import UserUpdate
+from src.modules.users.service import UserService
+import time
+
+ADMIN_ROUTE = "/api/products/low-stock"
+
+
+def user_lookups(statements: list) -> int:
+    return sum("FROM usuarios" in statement for statement in statements)
+
+
+def test_miss_loads_user_and_hit_skips_database(db, api, make_usuario, auth_headers, count_queries):
+    usuario = make_usuario("admin")
+    headers = auth_headers(usuario)
+    
+    with count_queries(engine) as miss:
+        assert api.get(ADMIN_ROUTE, headers=headers).status_code == 200
+    with count_queries(engine) as hit:
+        assert api.get(ADMIN_ROUTE, headers=headers).status_code == 200
+    
+    assert user_lookups(miss) == 1
+    assert user_lookups(hit) == 0
+    # Only what authorization needs is cached, never the password hash
+    assert user_cache.get(usuario.id) == CurrentUser(id=usuario.id, username=usuario.username, rol="admin", is_active=True)
+    assert api.get("/api/users/me", headers=headers).json()["email"] == usuario.email
+
+
+def test_role_change_applies_to_next_request(db, api, make_usuario, auth_headers):
+    usuario = make_usuario("admin")
+    headers = auth_headers(usuario)
+    assert api.get(ADMIN_ROUTE, headers=headers).status_code == 200
+    
+    UserService.update_user(db, usuario.id, UserUpdate(rol="vendedor"))
+    
+    assert api.get(ADMIN_ROUTE, headers=headers).status_code == 403
+
+
+def test_deactivation_applies_to_next_request(db, api, make_usuario, auth_headers):
+    usuario = make_usuario("admin")
+    headers = auth_headers(usuario)
+    assert api.get(ADMIN_ROUTE, headers=headers).status_code == 200
+    
+    UserService.delete_user(db, usuario.id)
+    
+    response = api.get(ADMIN_ROUTE, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+
+def test_change_from_another_worker_applies_after_ttl(db, api, make_usuario, auth_headers, monkeypatch):
+    monkeypatch.setattr(user_cache, "ttl", 0.5)
+    usuario = make_usuario("admin")
+    headers = auth_headers(usuario)
+    assert api.get(ADMIN_ROUTE, headers=headers).status_code == 200
+    
+    # Another process deactivates the user: this process is not told
+    db.execute(update(Usuario).where(Usuario.id == usuario.id).values(is_active=False))
+    db.commit()
+    assert api.get(ADMIN_ROUTE, headers=headers).status_code == 200
+    
+    time.sleep(0.6)
+    assert api.get(ADMIN_ROUTE, headers=headers).status_code == 400
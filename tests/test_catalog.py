@@ -0,0 +1,58 @@
+"""Public catalog: ETag, 304 on If-None-Match and invalidation on product and stock changes"""
+from src.core.database import async_engine
+from src.modules.orders.schema import OrderCreate
+from src.modules.orders.service import OrderService
+
+CATALOG = "/api/products/catalog"
+
+
+def test_etag_round_trip(db, api, make_producto):
+    make_producto(stock=3, nombre="Café")
+    make_producto(stock=0, nombre="Agotado")
+    
+    response = api.get(CATALOG)
+    etag = response.headers["ETag"]
+    
+    assert response.status_code == 200
+    assert [producto["nombre"] for producto in response.json()] == ["Café"]
+    for if_none_match in (etag, f"W/{etag}", f'"otro", {etag}', "*"):
+        not_modified = api.get(CATALOG, headers={"If-None-Match": if_none_match})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+    assert api.get(CATALOG, headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_catalog_is_rendered_once(db, api, make_producto, count_queries):
+    make_producto(stock=3)
+    
+    with count_queries(async_engine.sync_engine) as statements:
+        first = api.get(CATALOG)
+        second = api.get(CATALOG)
+    
+    assert first.content == second.content
+    assert sum("FROM productos" in statement for statement in statements) == 1
+
+
+def test_product_write_invalidates_catalog(db, api, make_producto, make_usuario, auth_headers):
+    producto_id = make_producto(stock=3, precio="10.00").id
+    etag = api.get(CATALOG).headers["ETag"]
+    
+    response = api.patch(f"/api/products/{producto_id}", json={"precio_venta": "12.50"}, headers=auth_headers(make_usuario()))
+    assert response.status_code == 200
+    
+    response = api.get(CATALOG, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert float(response.json()[0]["precio_venta"]) == 12.5
+
+
+def test_stock_change_invalidates_catalog(db, api, cliente, make_producto):
+    producto_id = make_producto(stock=2).id
+    etag = api.get(CATALOG).headers["ETag"]
+    
+    OrderService.create_order(db, OrderCreate(cliente_id=cliente.id, detalles=[{"producto_id": producto_id, "cantidad": 2}]))
+    
+    response = api.get(CATALOG, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == []
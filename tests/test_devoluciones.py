@@ -0,0 +1,165 @@
+"""Order returns against PostgreSQL: restock, reversal and the daily rollup"""
+from datetime import date
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from src.core.database import SessionLocal
+from src.modules.devoluciones.model import Devolucion
+from src.modules.devoluciones.schema import DevolucionCreate
+from src.modules.devoluciones.service import DevolucionService
+from src.modules.orders.model import DetallePedido, Pedido, VentaDiaria
+from src.modules.orders.schema import OrderCreate
+from src.modules.orders.service import OrderService
+from src.modules.payments.model import Pago
+from src.modules.products.model import Producto
+import pytest
+
+MOTIVO = "Retirada del proveedor"
+
+
+@pytest.fixture
+def productos(make_producto):
+    return make_producto(stock=10, nombre="Arroz"), make_producto(stock=10, nombre="Frijoles")
+
+
+@pytest.fixture
+def place(db, cliente, productos):
+    """Place a paid order of `cantidades` units of each product"""
+    def make(*cantidades: int) -> Pedido:
+        detalles = [
+            {"producto_id": producto.id, "cantidad": cantidad}
+            for producto, cantidad in zip(productos, cantidades) if cantidad
+        ]
+        pago = {
+            "monto": Decimal(10 * sum(cantidades)), "cuenta_origen": "9200000001",
+            "codigo_transfermovil": f"TM{db.query(Pedido).count() + 1}"
+        }
+        return OrderService.create_order(
+            db, OrderCreate(cliente_id=cliente.id, detalles=detalles, pago_inmediato=True, pago=pago)
+        )
+    return make
+
+
+def count(db, model, pedido_id: int) -> int:
+    return db.scalar(select(func.count()).select_from(model).where(model.pedido_id == pedido_id))
+
+
+def stock(db, productos) -> list:
+    db.expire_all()
+    return [db.get(Producto, producto.id).stock for producto in productos]
+
+
+def rollup_today(db) -> VentaDiaria:
+    db.expire_all()
+    return db.get(VentaDiaria, date.today())
+
+
+def test_return_restocks_and_reverses_order(db, place, productos, make_usuario):
+    usuario_id = make_usuario().id
+    pedido = place(3, 2)
+    otro = place(1, 1)
+    assert stock(db, productos) == [6, 7]
+    before = rollup_today(db)
+    cobrado, pagados = before.total_cobrado, before.pedidos_pagados
+    
+    devolucion = DevolucionService.crear_devolucion(db, DevolucionCreate(pedido_id=pedido.id, motivo=MOTIVO), usuario_id)
+    
+    assert stock(db, productos) == [9, 9]
+    assert count(db, DetallePedido, pedido.id) == 0
+    assert count(db, Pago, pedido.id) == 0
+    # The other order keeps its lines and payment
+    assert count(db, DetallePedido, otro.id) == 2
+    assert count(db, Pago, otro.id) == 1
+    
+    pedido = db.get(Pedido, pedido.id)
+    assert pedido.estado == "devuelto"
+    assert pedido.total_pagado == 0
+    assert sorted((item["nombre"], item["cantidad"]) for item in devolucion.productos_devueltos) == [
+        ("Arroz", 3), ("Frijoles", 2)
+    ]
+    assert devolucion.monto_total == Decimal("50.00")
+    
+    after = rollup_today(db)
+    assert after.total_cobrado == cobrado - Decimal("50.00")
+    assert after.cantidad_pagos == 1
+    assert after.pedidos_pagados == pagados - 1
+    assert after.devoluciones == 1
+    assert after.monto_devuelto == Decimal("50.00")
+
+
+def test_order_can_only_be_returned_once(db, place, make_usuario):
+    usuario_id = make_usuario().id
+    pedido_id = place(1, 0).id
+    DevolucionService.crear_devolucion(db, DevolucionCreate(pedido_id=pedido_id, motivo=MOTIVO), usuario_id)
+    
+    with pytest.raises(HTTPException) as error:
+        DevolucionService.crear_devolucion(db, DevolucionCreate(pedido_id=pedido_id, motivo=MOTIVO), usuario_id)
+    assert error.value.status_code == 400
+    assert error.value.detail == "Este pedido ya fue devuelto"
+    
+    with pytest.raises(HTTPException) as error:
+        DevolucionService.crear_devolucion(db, DevolucionCreate(pedido_id=0, motivo=MOTIVO), usuario_id)
+    assert error.value.status_code == 404
+
+
+def test_bulk_returns_many_orders_and_reports_the_rest(db, place, productos, make_usuario):
+    usuario_id = make_usuario().id
+    first, second, kept = place(2, 1), place(1, 3), place(1, 1)
+    returned = place(1, 0)
+    DevolucionService.crear_devolucion(db, DevolucionCreate(pedido_id=returned.id, motivo=MOTIVO), usuario_id)
+    assert stock(db, productos) == [6, 5]
+    
+    report = DevolucionService.crear_devoluciones_bulk(db, [
+        DevolucionCreate(pedido_id=pedido_id, motivo=MOTIVO)
+        for pedido_id in (first.id, 0, second.id, first.id, returned.id)
+    ], usuario_id)
+    
+    assert report["created"] == 2
+    assert [result["error"] for result in report["results"]] == [
+        None,
+        "Pedido no encontrado",
+        None,
+        "Ya existe una devolución para este pedido",
+        "Este pedido ya fue devuelto",
+    ]
+    # The repeated order is restocked once
+    assert stock(db, productos) == [9, 9]
+    for pedido_id in (first.id, second.id):
+        assert count(db, DetallePedido, pedido_id) == 0
+        assert count(db, Pago, pedido_id) == 0
+    assert count(db, DetallePedido, kept.id) == 2
+    
+    rollup = rollup_today(db)
+    assert rollup.devoluciones == 3
+    assert rollup.monto_devuelto == Decimal("80.00")
+    assert rollup.cantidad_pagos == 1
+    assert rollup.total_cobrado == Decimal("20.00")
+
+
+def test_concurrent_returns_of_same_order(db, place, productos, make_usuario, run_concurrently):
+    usuario_id = make_usuario().id
+    pedido_id = place(2, 2).id
+    
+    def devolver(i):
+        session = SessionLocal()
+        try:
+            data = DevolucionCreate(pedido_id=pedido_id, motivo=MOTIVO)
+            if i % 2:
+                return DevolucionService.crear_devoluciones_bulk(session, [data], usuario_id)["results"][0]
+            return DevolucionService.crear_devolucion(session, data, usuario_id).id
+        finally:
+            session.close()
+    
+    results = run_concurrently(devolver, 4)
+    
+    created = [r for r in results if isinstance(r, int) or (isinstance(r, dict) and r["devolucion_id"])]
+    rejected = [r for r in results if isinstance(r, HTTPException) or (isinstance(r, dict) and r["error"])]
+    assert len(created) == 1
+    assert len(rejected) == 3
+    assert all(r.status_code == 400 for r in rejected if isinstance(r, HTTPException))
+    
+    assert stock(db, productos) == [10, 10]
+    assert db.scalar(select(func.count()).select_from(Devolucion).where(Devolucion.pedido_id == pedido_id)) == 1
+    rollup = rollup_today(db)
+    assert rollup.devoluciones == 1
+    assert rollup.cantidad_pagos == 0
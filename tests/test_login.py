@@ -0,0 +1,142 @@
+"""Login rate limiting, the bcrypt hashing pool and rehash on login"""
+from fastapi import HTTPException
+from src.config.settings import get_settings
+from src.core.rate_limit import TokenBucketLimiter
+from src.core.security import PasswordHasher
+from src.modules.auth import service as auth_service
+import asyncio
+import pytest
+import time
+
+settings = get_settings()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("src.core.rate_limit.time.monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    """Fresh login limiters so attempts from other tests don't count"""
+    monkeypatch.setattr(auth_service, "username_limiter", TokenBucketLimiter(burst=2, per_minute=60))
+    monkeypatch.setattr(auth_service, "ip_limiter", TokenBucketLimiter(burst=100, per_minute=60))
+
+
+def test_bucket_allows_burst_then_limits(clock):
+    limiter = TokenBucketLimiter(burst=3, per_minute=60)
+    
+    assert [limiter.acquire("ana") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("ana") == pytest.approx(1.0)
+    # Other keys have their own bucket
+    assert limiter.acquire("luis") == 0
+    assert limiter.stats()["allowed"] == 4
+    assert limiter.stats()["limited"] == 1
+
+
+def test_bucket_refills_over_time_up_to_burst(clock):
+    limiter = TokenBucketLimiter(burst=3, per_minute=60)
+    for _ in range(3):
+        limiter.acquire("ana")
+    
+    clock.now += 0.5
+    assert limiter.acquire("ana") == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.acquire("ana") == 0
+    
+    clock.now += 3600
+    assert [limiter.acquire("ana") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("ana") > 0
+
+
+def test_bucket_evicts_least_recently_used_keys(clock):
+    limiter = TokenBucketLimiter(burst=1, per_minute=60, max_keys=2)
+    for key in ("ana", "luis", "eva"):
+        limiter.acquire(key)
+    
+    assert limiter.stats()["keys"] == 2
+    # "ana" was evicted, so it starts over with a full bucket
+    assert limiter.acquire("ana") == 0
+    assert limiter.acquire("eva") > 0
+
+
+def test_hasher_rejects_jobs_past_queue_timeout_or_max_queue():
+    hasher = PasswordHasher(workers=1, queue_timeout=0.05, max_queue=1)
+    
+    async def attempts():
+        return await asyncio.gather(
+            hasher.run(time.sleep, 0.2),
+            hasher.run(lambda: "queued"),
+            hasher.run(lambda: "no slot"),
+            return_exceptions=True
+        )
+    
+    try:
+        slow, queued, no_slot = asyncio.run(attempts())
+        # The slot is back once the pool is idle
+        assert asyncio.run(hasher.run(lambda: "ok")) == "ok"
+    finally:
+        hasher.shutdown()
+    
+    assert slow is None
+    for rejected in (queued, no_slot):
+        assert isinstance(rejected, HTTPException)
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "1"
+    assert hasher.stats()["rejected"] == 2
+    assert hasher.stats()["pending"] == 0
+
+
+def test_login_rehashes_when_bcrypt_rounds_change(db, api, make_usuario, limiters, monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    usuario = make_usuario("vendedor")
+    assert usuario.hashed_password.startswith("$2b$04$")
+    
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    response = api.post("/api/auth/login", json={"username": usuario.username, "password": "secreto123"})
+    assert response.status_code == 200
+    
+    db.refresh(usuario)
+    rehashed = usuario.hashed_password
+    assert rehashed.startswith("$2b$05$")
+    
+    # The new hash verifies and is left alone while the cost doesn't change
+    response = api.post("/api/auth/login", json={"username": usuario.username, "password": "secreto123"})
+    assert response.status_code == 200
+    db.refresh(usuario)
+    assert usuario.hashed_password == rehashed
+
+
+def test_failed_login_keeps_old_hash(db, api, make_usuario, limiters, monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    usuario = make_usuario("vendedor")
+    old_hash = usuario.hashed_password
+    
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    response = api.post("/api/auth/login", json={"username": usuario.username, "password": "incorrecta"})
+    
+    assert response.status_code == 401
+    db.refresh(usuario)
+    assert usuario.hashed_password == old_hash
+
+
+def test_login_is_rate_limited_per_username(db, api, make_usuario, limiters, monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    usuario = make_usuario("vendedor")
+    credentials = {"username": usuario.username, "password": "incorrecta"}
+    
+    assert [api.post("/api/auth/login", json=credentials).status_code for _ in range(2)] == [401, 401]
+    response = api.post("/api/auth/login", json={**credentials, "username": usuario.username.upper()})
+    
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
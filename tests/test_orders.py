@@ -0,0 +1,220 @@
+"""Order creation and loading against PostgreSQL"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from src.core.database import SessionLocal, AsyncSessionLocal, async_engine
+from src.modules.orders.model import DetallePedido, Pedido
+from src.modules.payments.model import Pago
+from src.modules.orders.schema import OrderCreate
+from src.modules.orders.service import OrderService
+from src.modules.products.model import Producto
+import asyncio
+import pytest
+import time
+
+
+def order_for(cliente_id: int, productos: list, cantidad: int = 1) -> OrderCreate:
+    return OrderCreate(
+        cliente_id=cliente_id,
+        detalles=[{"producto_id": producto_id, "cantidad": cantidad} for producto_id in productos]
+    )
+
+
+def test_concurrent_orders_never_oversell(db, cliente, make_producto, run_concurrently):
+    stock = 5
+    producto_id = make_producto(stock=stock).id
+    otro_id = make_producto(stock=100).id
+    cliente_id = cliente.id
+    
+    def place_order(i):
+        session = SessionLocal()
+        try:
+            # Half of the orders list the products in the opposite order, to catch lock-order deadlocks
+            productos = [producto_id, otro_id] if i % 2 else [otro_id, producto_id]
+            return OrderService.create_order(session, order_for(cliente_id, productos)).id
+        finally:
+            session.close()
+    
+    results = run_concurrently(place_order, 12)
+    
+    created = [result for result in results if isinstance(result, int)]
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(created) == stock
+    assert len(rejected) == len(results) - stock
+    assert all(error.status_code == 400 for error in rejected)
+    
+    db.expire_all()
+    assert db.get(Producto, producto_id).stock == 0
+    assert db.get(Producto, otro_id).stock == 100 - stock
+    assert db.scalar(select(func.count(Pedido.id))) == stock
+    assert db.scalar(
+        select(func.sum(DetallePedido.cantidad)).where(DetallePedido.producto_id == producto_id)
+    ) == stock
+
+
+def seed_orders(db, cliente_id: int, productos: list, count: int) -> list:
+    """Orders with one line per product and two payments each"""
+    orders = []
+    for _ in range(count):
+        order = Pedido(cliente_id=cliente_id, estado="pendiente", total=Decimal("100.00"), total_pagado=Decimal("20.00"))
+        order.detalles = [
+            DetallePedido(producto_id=producto.id, cantidad=1, precio_unitario=Decimal("10.00"), subtotal=Decimal("10.00"))
+            for producto in productos
+        ]
+        order.pagos = [Pago(monto=Decimal("10.00"), cuenta_origen="9200000001") for _ in range(2)]
+        orders.append(order)
+    db.add_all(orders)
+    db.commit()
+    return [order.id for order in orders]
+
+
+def test_order_detail_query_count_does_not_grow_with_lines(db, cliente, make_producto, count_queries):
+    pocos = seed_orders(db, cliente.id, [make_producto(stock=10)], 1)[0]
+    muchos = seed_orders(db, cliente.id, [make_producto(stock=10) for _ in range(8)], 1)[0]
+    db.expire_all()
+    
+    counts = {}
+    for order_id in (pocos, muchos):
+        with count_queries(db.get_bind()) as statements:
+            order = OrderService.get_by_id(db, order_id, include_productos=True, include_pagos=True)
+            assert all(detalle.producto.nombre for detalle in order.detalles)
+            assert len(order.pagos) == 2
+        counts[order_id] = len(statements)
+        db.expire_all()
+    
+    # Order, its lines joined to their products, its payments
+    assert counts[pocos] == counts[muchos] == 3
+
+
+def test_order_list_query_count_does_not_grow_with_page(db, cliente, make_producto, count_queries):
+    productos = [make_producto(stock=10) for _ in range(3)]
+    seed_orders(db, cliente.id, productos, 25)
+    
+    async def list_orders(limit: int) -> int:
+        async with AsyncSessionLocal() as session:
+            with count_queries(async_engine.sync_engine) as statements:
+                orders = await OrderService.list_orders_async(
+                    session, limit=limit, include_productos=True, include_pagos=True
+                )
+                assert len(orders) == limit
+                assert all(len(order.detalles) == 3 and len(order.pagos) == 2 for order in orders)
+            return len(statements)
+    
+    async def run() -> list:
+        try:
+            return [await list_orders(limit) for limit in (2, 25)]
+        finally:
+            await async_engine.dispose()
+    
+    assert asyncio.run(run()) == [3, 3]
+
+
+def paid_order_for(cliente_id: int, productos: list, codigo: str) -> OrderCreate:
+    return OrderCreate(
+        cliente_id=cliente_id,
+        detalles=[{"producto_id": producto_id, "cantidad": 1} for producto_id in productos],
+        pago_inmediato=True,
+        pago={"monto": Decimal("10.00"), "cuenta_origen": "9200000001", "codigo_transfermovil": codigo}
+    )
+
+
+def test_order_with_registered_code_is_rejected(db, cliente, make_producto):
+    producto_id = make_producto(stock=5).id
+    OrderService.create_order(db, paid_order_for(cliente.id, [producto_id], "TM1"))
+    
+    with pytest.raises(HTTPException) as error:
+        OrderService.create_order(db, paid_order_for(cliente.id, [producto_id], "TM1"))
+    
+    assert error.value.status_code == 400
+    assert error.value.detail == "Transfermóvil code already registered"
+    db.expire_all()
+    assert db.get(Producto, producto_id).stock == 4
+    assert db.scalar(select(func.count(Pedido.id))) == 1
+
+
+def test_bulk_orders_all_valid(db, cliente, make_producto):
+    producto_id = make_producto(stock=10).id
+    orders = [order_for(cliente.id, [producto_id], cantidad=2) for _ in range(3)]
+    orders.append(paid_order_for(cliente.id, [producto_id], "TM1"))
+    
+    result = OrderService.create_orders_bulk(db, orders)
+    
+    assert result["created"] == 4
+    assert result["failed"] == 0
+    assert all(item["order_id"] and item["error"] is None for item in result["results"])
+    db.expire_all()
+    assert db.get(Producto, producto_id).stock == 3
+    assert db.scalar(select(func.count(Pedido.id))) == 4
+    assert db.scalar(select(func.count(DetallePedido.id))) == 4
+    assert db.scalar(select(Pago.pedido_id).where(Pago.codigo_transfermovil == "TM1")) == result["results"][3]["order_id"]
+
+
+def test_bulk_orders_reject_invalid_orders_only(db, cliente, make_producto):
+    producto_id = make_producto(stock=3).id
+    OrderService.create_order(db, paid_order_for(cliente.id, [producto_id], "TM1"))
+    
+    result = OrderService.create_orders_bulk(db, [
+        order_for(cliente.id, [producto_id]),
+        order_for(cliente.id, [producto_id], cantidad=5),
+        paid_order_for(cliente.id, [producto_id], "TM1"),
+        paid_order_for(cliente.id, [producto_id], "TM2"),
+        paid_order_for(cliente.id, [producto_id], "TM2"),
+    ])
+    
+    assert result["created"] == 2
+    assert [item["error"] for item in result["results"]] == [
+        None,
+        "Insufficient stock for product 'Producto'. Available: 1",
+        "Transfermóvil code already registered",
+        None,
+        "Transfermóvil code already registered",
+    ]
+    db.expire_all()
+    assert db.get(Producto, producto_id).stock == 0
+    assert db.scalar(select(func.count(Pedido.id))) == 3
+    assert db.scalar(select(func.count(Pago.id)).where(Pago.codigo_transfermovil == "TM2")) == 1
+
+
+def test_bulk_orders_roll_back_on_concurrently_registered_code(db, cliente, make_producto):
+    producto_id = make_producto(stock=10).id
+    cliente_id = cliente.id
+    existing = Pedido(cliente_id=cliente_id, estado="pagado", total=Decimal("10.00"), total_pagado=Decimal("10.00"))
+    db.add(existing)
+    db.commit()
+    
+    # Register TM1 in an open transaction: the batch does not see it until it commits
+    other = SessionLocal()
+    other.add(Pago(pedido_id=existing.id, monto=Decimal("10.00"), cuenta_origen="9200000001", codigo_transfermovil="TM1"))
+    other.flush()
+    
+    def create_batch():
+        session = SessionLocal()
+        try:
+            return OrderService.create_orders_bulk(session, [
+                order_for(cliente_id, [producto_id]),
+                paid_order_for(cliente_id, [producto_id], "TM1"),
+            ])
+        except HTTPException as e:
+            return e
+        finally:
+            session.close()
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(create_batch)
+        # Commit once the batch waits on the unique index entry of TM1
+        deadline = time.monotonic() + 10
+        while not db.scalar(text("SELECT count(*) FROM pg_locks WHERE NOT granted")):
+            assert time.monotonic() < deadline, "the batch never waited on the pending code"
+            time.sleep(0.05)
+        db.rollback()
+        other.commit()
+        other.close()
+        error = future.result(timeout=10)
+    
+    assert isinstance(error, HTTPException)
+    assert error.status_code == 400
+    db.expire_all()
+    assert db.get(Producto, producto_id).stock == 10
+    assert db.scalar(select(func.count(Pedido.id))) == 1
+    assert db.scalar(select(func.count(DetallePedido.id))) == 0
@@ -0,0 +1,98 @@
+"""Keyset (cursor) pagination of the list endpoints"""
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from src.core.base_service import BaseService, NEXT_CURSOR_HEADER, encode_cursor
+from src.modules.orders.model import Pedido
+from src.modules.products.model import Producto
+import base64
+import pytest
+
+
+def seed_productos(db, count: int) -> list:
+    """Products in groups of three sharing created_at, so pages have to break ties on id"""
+    productos = [
+        Producto(
+            nombre=f"Producto {i}", precio_venta=Decimal("10.00"), stock=1, stock_minimo=0,
+            created_at=datetime(2026, 1, 1 + i // 3)
+        )
+        for i in range(count)
+    ]
+    db.add_all(productos)
+    db.commit()
+    return sorted(productos, key=lambda producto: (producto.created_at, producto.id), reverse=True)
+
+
+def walk(api, url: str, headers: dict, limit: int) -> list:
+    """Follow X-Next-Cursor from the first page; returns the ids of every page"""
+    pages = []
+    cursor = ""
+    while cursor is not None:
+        response = api.get(url, params={"cursor": cursor, "limit": limit}, headers=headers)
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return pages
+
+
+def test_cursor_pages_cover_every_row_once(db, api, make_usuario, auth_headers):
+    expected = [producto.id for producto in seed_productos(db, 8)]
+    
+    pages = walk(api, "/api/products/", auth_headers(make_usuario()), limit=3)
+    
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert [producto_id for page in pages for producto_id in page] == expected
+
+
+def test_cursor_pages_on_async_route(db, api, cliente, make_usuario, auth_headers):
+    orders = [
+        Pedido(cliente_id=cliente.id, estado="pendiente", total=Decimal("10.00"), created_at=datetime(2026, 1, 1 + i // 2))
+        for i in range(6)
+    ]
+    db.add_all(orders)
+    db.commit()
+    expected = [order.id for order in sorted(orders, key=lambda order: (order.created_at, order.id), reverse=True)]
+    
+    pages = walk(api, "/api/orders/", auth_headers(make_usuario()), limit=3)
+    
+    # A full last page still gets a cursor; the page after it is empty
+    assert pages == [expected[:3], expected[3:], []]
+
+
+def test_offset_pages_have_no_cursor(db, api, make_usuario, auth_headers):
+    seed_productos(db, 4)
+    
+    response = api.get("/api/products/", params={"limit": 2}, headers=auth_headers(make_usuario()))
+    
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    base64.urlsafe_b64encode(b'{"created_at": 1}').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", 1]').decode(),
+    base64.urlsafe_b64encode(b'[null, 1]').decode(),
+])
+def test_malformed_cursor_is_rejected(db, api, make_usuario, auth_headers, cursor):
+    response = api.get("/api/products/", params={"cursor": cursor}, headers=auth_headers(make_usuario()))
+    
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_cursor_page_is_read_from_the_index(db, cliente):
+    last = Pedido(id=10, cliente_id=cliente.id, estado="pendiente", total=Decimal("10.00"), created_at=datetime(2026, 1, 1))
+    query = BaseService.keyset(db.query(Pedido), Pedido, 50, encode_cursor(last))
+    sql = query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    
+    # The table is tiny: rule out the scans the planner would prefer at this size
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    db.execute(text("SET LOCAL enable_bitmapscan = off"))
+    plan = "\n".join(db.scalars(text(f"EXPLAIN {sql}")))
+    db.rollback()
+    
+    assert "ix_pedidos_created_id" in plan
+    assert "Sort" not in plan
@@ -0,0 +1,70 @@
+"""Payment registration against PostgreSQL"""
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from src.core.database import SessionLocal
+from src.modules.orders.model import Pedido
+from src.modules.payments.model import Pago
+from src.modules.payments.schema import PaymentCreate
+from src.modules.payments.service import PaymentService
+import pytest
+
+
+@pytest.fixture
+def pedido(db, cliente):
+    """A pending order of 100.00 with nothing paid"""
+    order = Pedido(cliente_id=cliente.id, estado="pendiente", total=Decimal("100.00"), total_pagado=Decimal(0))
+    db.add(order)
+    db.commit()
+    return order
+
+
+def test_concurrent_payments_never_overpay(db, pedido, run_concurrently):
+    pedido_id = pedido.id
+    
+    def pay(i):
+        session = SessionLocal()
+        try:
+            payment = PaymentCreate(
+                pedido_id=pedido_id, monto=Decimal("30.00"), cuenta_origen="9200000001",
+                codigo_transfermovil=f"TM{i}"
+            )
+            return PaymentService.create_payment(session, payment).id
+        finally:
+            session.close()
+    
+    results = run_concurrently(pay, 10)
+    
+    # 3 x 30 fit in the order, a 4th would exceed the remaining 10
+    created = [result for result in results if isinstance(result, int)]
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(created) == 3
+    assert len(rejected) == 7
+    assert all(error.status_code == 400 for error in rejected)
+    
+    db.expire_all()
+    order = db.get(Pedido, pedido_id)
+    assert order.total_pagado == Decimal("90.00")
+    assert order.estado == "pendiente"
+    assert db.scalar(select(func.sum(Pago.monto)).where(Pago.pedido_id == pedido_id)) == Decimal("90.00")
+
+
+def test_concurrent_payments_mark_order_paid_once(db, pedido, run_concurrently):
+    pedido_id = pedido.id
+    
+    def pay(i):
+        session = SessionLocal()
+        try:
+            payment = PaymentCreate(pedido_id=pedido_id, monto=Decimal("25.00"), cuenta_origen="9200000001")
+            return PaymentService.create_payment(session, payment).id
+        finally:
+            session.close()
+    
+    results = run_concurrently(pay, 10)
+    
+    assert sum(isinstance(result, int) for result in results) == 4
+    db.expire_all()
+    order = db.get(Pedido, pedido_id)
+    assert order.total_pagado == order.total
+    assert order.estado == "pagado"
+    assert db.scalar(select(func.count(Pago.id)).where(Pago.pedido_id == pedido_id)) == 4
@@ -0,0 +1,209 @@
+"""Transfermóvil statement import against PostgreSQL"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from src.core.database import SessionLocal
+from src.modules.orders.model import Pedido
+from src.modules.payments.model import Pago
+from src.modules.payments.reconciliation_service import DUPLICATE_RETRIES, ReconciliationService
+import io
+import pytest
+
+CUENTA = "9200000001"
+
+
+def statement(*rows: str, header: str = "codigo_transfermovil,monto,cuenta_origen,pedido_id") -> io.BytesIO:
+    return io.BytesIO("\n".join([header, *rows]).encode("utf-8"))
+
+
+@pytest.fixture
+def make_pedido(db, cliente):
+    """Factory of orders of the test client, oldest first"""
+    def make(total: str, estado: str = "pendiente") -> Pedido:
+        fecha = datetime.utcnow() - timedelta(hours=10) + timedelta(minutes=db.query(Pedido).count())
+        pedido = Pedido(
+            cliente_id=cliente.id, estado=estado, total=Decimal(total), total_pagado=Decimal(0), fecha_pedido=fecha
+        )
+        db.add(pedido)
+        db.commit()
+        return pedido
+    return make
+
+
+@pytest.fixture
+def register_concurrently(db, make_pedido, monkeypatch):
+    """
+    Make ReconciliationService.apply commit, from another session, a payment with
+    the code of the first pending line just before it inserts (`times` times)
+    """
+    otro = make_pedido("500.00", estado="pagado")
+    apply = ReconciliationService.apply
+    registrados = []
+    
+    def setup(times: int):
+        def racing_apply(session, pagos, abonados):
+            if len(registrados) < times:
+                codigo = pagos[0]["codigo_transfermovil"]
+                other = SessionLocal()
+                try:
+                    other.add(Pago(pedido_id=otro.id, monto=Decimal("1.00"), cuenta_origen="9200000999", codigo_transfermovil=codigo))
+                    other.commit()
+                finally:
+                    other.close()
+                registrados.append(codigo)
+            apply(session, pagos, abonados)
+        monkeypatch.setattr(ReconciliationService, "apply", staticmethod(racing_apply))
+        return registrados
+    return setup
+
+
+def results_by_line(report: dict) -> dict:
+    return {result["line"]: (result["status"], result["error"]) for result in report["results"]}
+
+
+def test_missing_columns_reject_the_file(db):
+    with pytest.raises(HTTPException) as error:
+        ReconciliationService.import_statement(db, statement("TM1;10.00", header="codigo_transfermovil;monto"))
+    
+    assert error.value.status_code == 400
+    assert error.value.detail == "Missing statement columns: cuenta_origen"
+
+
+def test_unparseable_lines_are_reported_invalid(db, make_pedido):
+    pedido = make_pedido("10.00")
+    report = ReconciliationService.import_statement(db, statement(
+        f"TM1;diez;{CUENTA};",
+        f"TM2;10.00;{CUENTA};uno",
+        f";10.00;{CUENTA};",
+        "TM3;10.00;;",
+        f"TM4;0;{CUENTA};",
+        f"TM5;-5;{CUENTA};",
+        f"TM6;10.00;{CUENTA};",
+        header="Codigo_Transfermovil;Monto;Cuenta_Origen;Pedido_Id"
+    ))
+    
+    assert results_by_line(report) == {
+        2: ("invalid", "Invalid amount, date or order id"),
+        3: ("invalid", "Invalid amount, date or order id"),
+        4: ("invalid", "Missing codigo_transfermovil or cuenta_origen"),
+        5: ("invalid", "Missing codigo_transfermovil or cuenta_origen"),
+        6: ("invalid", "Amount must be positive"),
+        7: ("invalid", "Amount must be positive"),
+        8: ("applied", None),
+    }
+    assert report["invalid"] == 6
+    db.refresh(pedido)
+    assert pedido.estado == "pagado"
+
+
+def test_duplicate_codes_in_file_and_database(db, make_pedido):
+    pedido = make_pedido("100.00")
+    db.add(Pago(pedido_id=pedido.id, monto=Decimal("10.00"), cuenta_origen=CUENTA, codigo_transfermovil="TM-DB"))
+    db.commit()
+    
+    report = ReconciliationService.import_statement(db, statement(
+        f"TM-DB,10.00,{CUENTA},",
+        f"TM1,20.00,{CUENTA},",
+        f"TM1,20.00,{CUENTA},",
+        f"TM2,30.00,{CUENTA},",
+    ))
+    
+    assert results_by_line(report) == {
+        2: ("duplicate", "Transfermóvil code already registered"),
+        3: ("applied", None),
+        4: ("duplicate", "Transfermóvil code already registered"),
+        5: ("applied", None),
+    }
+    assert report["amount_applied"] == Decimal("50.00")
+    assert db.scalar(select(func.count()).select_from(Pago).where(Pago.codigo_transfermovil == "TM1")) == 1
+
+
+def test_amount_over_the_named_order_balance_is_rejected(db, make_pedido):
+    pedido = make_pedido("50.00")
+    report = ReconciliationService.import_statement(db, statement(
+        f"TM1,30.00,{CUENTA},{pedido.id}",
+        f"TM2,30.00,{CUENTA},{pedido.id}",
+        f"TM3,20.00,{CUENTA},{pedido.id}",
+    ))
+    
+    assert results_by_line(report) == {
+        2: ("applied", None),
+        3: ("unmatched", "Payment amount ($30.00) exceeds remaining balance ($20.00)"),
+        4: ("applied", None),
+    }
+    db.refresh(pedido)
+    assert pedido.total_pagado == Decimal("50.00")
+    assert pedido.estado == "pagado"
+
+
+def test_unmatched_amount_is_never_applied(db, make_pedido):
+    pedido = make_pedido("50.00")
+    report = ReconciliationService.import_statement(db, statement(f"TM1,60.00,{CUENTA},"))
+    
+    assert results_by_line(report) == {2: ("unmatched", "No pending order of this account matches the amount")}
+    db.refresh(pedido)
+    assert pedido.total_pagado == 0
+
+
+def test_dry_run_applies_nothing(db, make_pedido):
+    pedido = make_pedido("50.00")
+    report = ReconciliationService.import_statement(db, statement(f"TM1,50.00,{CUENTA},"), dry_run=True)
+    
+    assert report["applied"] == 1
+    assert report["orders_paid"] == 1
+    assert db.scalar(select(func.count()).select_from(Pago)) == 0
+    db.refresh(pedido)
+    assert pedido.estado == "pendiente"
+
+
+def test_concurrently_registered_code_is_retried_as_duplicate(db, make_pedido, register_concurrently):
+    pedido = make_pedido("50.00")
+    registrados = register_concurrently(times=1)
+    
+    report = ReconciliationService.import_statement(db, statement(
+        f"TM1,20.00,{CUENTA},",
+        f"TM2,30.00,{CUENTA},",
+    ))
+    
+    assert registrados == ["TM1"]
+    assert results_by_line(report) == {
+        2: ("duplicate", "Transfermóvil code already registered"),
+        3: ("applied", None),
+    }
+    db.refresh(pedido)
+    # Only the line that was applied on the retry counts towards the order
+    assert pedido.total_pagado == Decimal("30.00")
+    assert pedido.estado == "pendiente"
+
+
+def test_gives_up_after_repeated_concurrent_registrations(db, make_pedido, register_concurrently):
+    pedido = make_pedido("100.00")
+    registrados = register_concurrently(times=DUPLICATE_RETRIES + 1)
+    lines = [f"TM{i},10.00,{CUENTA}," for i in range(DUPLICATE_RETRIES + 2)]
+    
+    with pytest.raises(HTTPException) as error:
+        ReconciliationService.import_statement(db, statement(*lines))
+    
+    assert error.value.status_code == 409
+    assert len(registrados) == DUPLICATE_RETRIES + 1
+    db.refresh(pedido)
+    assert pedido.total_pagado == 0
+
+
+def test_other_integrity_errors_are_not_retried(db, make_pedido, monkeypatch):
+    make_pedido("10.00")
+    calls = []
+    
+    def failing_apply(session, pagos, abonados):
+        calls.append(pagos)
+        raise IntegrityError("INSERT INTO pagos", {}, Exception("foreign key violation"))
+    monkeypatch.setattr(ReconciliationService, "apply", staticmethod(failing_apply))
+    
+    with pytest.raises(HTTPException) as error:
+        ReconciliationService.import_statement(db, statement(f"TM1,10.00,{CUENTA},"))
+    
+    assert error.value.status_code == 500
+    assert error.value.detail == "Error applying payments"
+    assert len(calls) == 1
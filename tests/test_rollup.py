@@ -0,0 +1,108 @@
+"""ventas_diarias kept up to date incrementally matches a rebuild from pedidos and pagos"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import select
+from src.modules.devoluciones.schema import DevolucionCreate
+from src.modules.devoluciones.service import DevolucionService
+from src.modules.orders.model import Pedido, VentaDiaria
+from src.modules.orders.rollup_service import RollupService
+from src.modules.orders.schema import OrderCreate
+from src.modules.orders.service import OrderService
+from src.modules.orders.stats_service import StatsService
+from src.modules.payments.model import Pago
+from src.modules.payments.reconciliation_service import ReconciliationService
+from src.modules.payments.schema import PaymentCreate
+from src.modules.payments.service import PaymentService
+import io
+
+
+def rollup_rows(db) -> dict:
+    """Rollup figures by day; days whose figures all went back to zero count as absent, as in a rebuild"""
+    rows = {
+        row.fecha: {
+            column.key: getattr(row, column.key)
+            for column in VentaDiaria.__table__.columns if column.key not in ("fecha", "updated_at")
+        }
+        for row in db.scalars(select(VentaDiaria))
+    }
+    return {fecha: figures for fecha, figures in rows.items() if any(figures.values())}
+
+
+def place(db, cliente_id: int, producto_id: int, cantidad: int = 1, codigo: str = None) -> Pedido:
+    pago = {"monto": Decimal(10 * cantidad), "cuenta_origen": "9200000001", "codigo_transfermovil": codigo} if codigo else None
+    order = OrderCreate(
+        cliente_id=cliente_id, detalles=[{"producto_id": producto_id, "cantidad": cantidad}],
+        pago_inmediato=pago is not None, pago=pago
+    )
+    return OrderService.create_order(db, order)
+
+
+def pay(db, pedido_id: int, monto: str):
+    PaymentService.create_payment(db, PaymentCreate(pedido_id=pedido_id, monto=Decimal(monto), cuenta_origen="9200000001"))
+
+
+def test_incremental_rollup_matches_rebuild(db, cliente, make_producto, make_usuario):
+    producto_id = make_producto(stock=100).id
+    usuario_id = make_usuario().id
+    today = date.today()
+    
+    # An order placed three days ago with a partial payment the day after, counted by a rebuild
+    old_day = today - timedelta(days=3)
+    old = Pedido(
+        cliente_id=cliente.id, fecha_pedido=datetime.combine(old_day, datetime.min.time()) + timedelta(hours=10),
+        estado="pendiente", total=Decimal("100.00"), total_pagado=Decimal("40.00")
+    )
+    old.pagos = [Pago(monto=Decimal("40.00"), cuenta_origen="9200000001", fecha_pago=old.fecha_pedido + timedelta(days=1))]
+    reconciled = Pedido(
+        cliente_id=cliente.id, fecha_pedido=old.fecha_pedido, estado="pendiente",
+        total=Decimal("25.00"), total_pagado=Decimal(0)
+    )
+    db.add_all([old, reconciled])
+    db.flush()
+    RollupService.rebuild(db, old_day, today)
+    db.commit()
+    
+    # Create: single, paid on the spot, and in bulk
+    pending = place(db, cliente.id, producto_id, cantidad=3)
+    paid = place(db, cliente.id, producto_id, codigo="TM1")
+    bulk = OrderService.create_orders_bulk(db, [
+        OrderCreate(cliente_id=cliente.id, detalles=[{"producto_id": producto_id, "cantidad": 2}]),
+        OrderCreate(
+            cliente_id=cliente.id, detalles=[{"producto_id": producto_id, "cantidad": 1}], pago_inmediato=True,
+            pago={"monto": Decimal("10.00"), "cuenta_origen": "9200000001", "codigo_transfermovil": "TM2"}
+        ),
+    ])
+    assert bulk["created"] == 2
+    
+    # Pay: partially, in full, and an old order paid today
+    pay(db, pending.id, "10.00")
+    pay(db, pending.id, "20.00")
+    pay(db, bulk["results"][0]["order_id"], "5.00")
+    pay(db, old.id, "60.00")
+    
+    # Reconcile a statement line dated yesterday against the other old order
+    statement = f"codigo_transfermovil,monto,cuenta_origen,fecha\nTM3,25.00,9200000001,{today - timedelta(days=1)}T09:00:00\n"
+    assert ReconciliationService.import_statement(db, io.BytesIO(statement.encode()))["applied"] == 1
+    
+    # Return: a paid order, then in bulk a partially paid order and the old one
+    DevolucionService.crear_devolucion(db, DevolucionCreate(pedido_id=paid.id, motivo="Producto dañado"), usuario_id)
+    returned = DevolucionService.crear_devoluciones_bulk(db, [
+        DevolucionCreate(pedido_id=bulk["results"][0]["order_id"], motivo="Retirada del proveedor"),
+        DevolucionCreate(pedido_id=old.id, motivo="Retirada del proveedor"),
+    ], usuario_id)
+    assert returned["created"] == 2
+    
+    db.expire_all()
+    incremental = rollup_rows(db)
+    RollupService.rebuild(db, old_day, today)
+    rebuilt = rollup_rows(db)
+    db.rollback()
+    
+    assert incremental == rebuilt
+    # The payment of the day after old_day was reversed by the return
+    assert set(incremental) == {old_day, today - timedelta(days=1), today}
+    for day in (old_day, old_day + timedelta(days=1), today - timedelta(days=1), today):
+        dia = db.scalars(StatsService._daily_sales_query(day)).first()
+        assert StatsService._daily_sales_result(day, dia) == StatsService.get_daily_sales_from_orders(db, day)
+    assert StatsService._pending_orders_result(db.execute(StatsService._pending_orders_query()).one()) \
+        == StatsService.get_pending_orders_summary_from_orders(db)